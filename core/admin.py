@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Profile, Post, LikePost, FollowersCount, Notification, Comment, Block
+from .models import Profile, Post, LikePost, FollowersCount, Notification, Comment, Block, TimelineEntry, Suggestion, NotificationCounter, MediaBlob
 
 # Register your models here.
 admin.site.register(Profile)
@@ -9,3 +9,7 @@ admin.site.register(FollowersCount)
 admin.site.register(Notification)
 admin.site.register(Comment)
 admin.site.register(Block)
+admin.site.register(TimelineEntry)
+admin.site.register(Suggestion)
+admin.site.register(NotificationCounter)
+admin.site.register(MediaBlob)
@@ -10,6 +10,7 @@ router.register(r'comments', api_views.CommentViewSet, basename='comment')
 router.register(r'followers', api_views.FollowersCountViewSet, basename='follower')
 router.register(r'notifications', api_views.NotificationViewSet, basename='notification')
 router.register(r'blocks', api_views.BlockViewSet, basename='block')
+router.register(r'uploads', api_views.UploadSessionViewSet, basename='upload')
 
 # API URL patterns
 urlpatterns = [
@@ -21,5 +22,9 @@ urlpatterns = [
     path('auth/login/', api_views.api_login, name='api-login'),
     path('auth/logout/', api_views.api_logout, name='api-logout'),
     path('auth/user/', api_views.api_user_info, name='api-user-info'),
+
+    # Search
+    path('search/', api_views.api_search, name='api-search'),
+    path('search/typeahead/', api_views.api_typeahead, name='api-typeahead'),
 ]
 
@@ -1,24 +1,34 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from django.contrib.auth.models import User
 from django.contrib import auth
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from itertools import chain
-import random
+from django.db import transaction
+from django.db.models import Count, Max, Q
 
-from .models import Profile, Post, LikePost, FollowersCount, Notification, Comment, Block
+from .models import (
+    Profile, Post, LikePost, FollowersCount, Notification, NotificationCounter, Comment, Block, UploadSession,
+)
 from .serializers import (
     UserSerializer, ProfileSerializer, PostSerializer, LikePostSerializer,
-    FollowersCountSerializer, CommentSerializer, NotificationSerializer, BlockSerializer
+    FollowersCountSerializer, CommentSerializer, NotificationSerializer, BlockSerializer,
+    UploadSessionSerializer
 )
 from .utils import create_notification
+from . import timeline, follows, suggestions, likes, blocks, realtime, notifications, images, uploads, search, typeahead, post_cards
+from .graph import follow_graph
+from .typeahead import username_index
+from .comments import comment_page
+from .conditional import ConditionalGetMixin, latest
+from .notification_queue import notification_queue
+from .pagination import encode_cursor, decode_cursor, parse_limit
 
 
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Profile model.
     list: Get all profiles
@@ -29,12 +39,14 @@ class ProfileViewSet(viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated]
+    modified_field = 'updated_at'
 
     def get_queryset(self):
         queryset = Profile.objects.all()
         username = self.request.query_params.get('username', None)
         if username:
-            queryset = queryset.filter(user__username__icontains=username)
+            # ranked full-text matches on username / bio / location
+            queryset = search.ranked(queryset, search.profile_ids(username))
         return queryset
 
     def get_serializer_context(self):
@@ -42,6 +54,12 @@ class ProfileViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    def perform_update(self, serializer):
+        old_image = serializer.instance.profileimg.name
+        profile = serializer.save()
+        if 'profileimg' in serializer.validated_data:
+            images.replace(profile, old_image)
+
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Get current user's profile"""
@@ -59,14 +77,14 @@ class ProfileViewSet(viewsets.ModelViewSet):
             profile = Profile.objects.get(user=request.user)
             serializer = self.get_serializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                self.perform_update(serializer)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Profile.DoesNotExist:
             return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Post model.
     list: Get all posts (filtered by user if provided)
@@ -78,6 +96,7 @@ class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    modified_field = 'updated_at'
 
     def get_queryset(self):
         queryset = Post.objects.all().order_by('-created_at')
@@ -92,106 +111,163 @@ class PostViewSet(viewsets.ModelViewSet):
         return context
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user.username)
+        with transaction.atomic():   # with the author's posts_count
+            post = serializer.save(user=self.request.user.username, author=self.request.user)
+        images.process(post)
+        timeline.fan_out_post(post)
+
+    def perform_update(self, serializer):
+        old_image = serializer.instance.image.name
+        post = serializer.save()
+        if 'image' in serializer.validated_data:
+            images.replace(post, old_image)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():   # with the author's posts_count
+            instance.delete()
+        images.delete_files(instance)
 
     def get_permissions(self):
+        if self.action == 'card_cache_stats':
+            return [IsAdminUser()]
         if self.action in ['list', 'retrieve']:
             return [IsAuthenticated()]
         return [IsAuthenticated()]
 
+    def _viewer_likes(self, request):
+        # changes whenever the viewer likes or unlikes anything (is_liked)
+        marker = LikePost.objects.filter(username=request.user.username).aggregate(n=Count('id'), last=Max('id'))
+        return marker['n'], marker['last']
+
+    def _authors_modified(self, usernames):
+        # embedded user_profile: avatar, counts
+        return Profile.objects.filter(user__username__in=usernames).aggregate(last=Max('updated_at'))['last']
+
+    def validator_parts(self, request, queryset):
+        authors = self._authors_modified(queryset.values('user'))
+        # the serializer adds buffered likes to no_of_likes; the buffer is small,
+        # so all of it goes in rather than matching it against the page
+        buffered = sorted((str(pk), delta) for pk, delta in likes.like_counter.snapshot().items())
+        return (*self._viewer_likes(request), authors, buffered)
+
+    def object_validator_parts(self, request, instance):
+        return (*self._viewer_likes(request), self._authors_modified([instance.user]),
+                likes.like_counter.pending(instance.id))
+
     @action(detail=True, methods=['post', 'delete'])
     def like(self, request, pk=None):
-        """Like or unlike a post"""
+        """Like (POST) or unlike (DELETE) a post. Both are idempotent."""
         post = self.get_object()
         username = request.user.username
-        like_filter = LikePost.objects.filter(post_id=str(post.id), username=username).first()
 
-        if like_filter is None:
-            # Like the post
-            LikePost.objects.create(post_id=str(post.id), username=username)
-            post.no_of_likes += 1
-            post.save()
+        if request.method == 'DELETE':
+            likes.unlike(post, username)
+            return Response({'status': 'unliked', 'likes': likes.like_count(post)})
 
-            # Create notification
-            if post.user != username:
-                create_notification(
-                    to_username=post.user,
-                    actor_username=username,
-                    verb="liked your post",
-                    notif_type="like",
-                    post_id=str(post.id),
-                    url=f"/profile/{post.user}"
-                )
+        created = likes.like(post, username, user=request.user)
+        if created and post.user != username:
+            create_notification(
+                to_username=post.user,
+                actor_username=username,
+                verb="liked your post",
+                notif_type="like",
+                post_id=str(post.id),
+                url=f"/profile/{post.user}"
+            )
+        return Response({'status': 'liked', 'likes': likes.like_count(post)},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        """
+        Comments on a post, cursor paginated (no page count).
+        ?order=newest|oldest  (default newest)
+        ?limit=N              page size (default 20, max 100)
+        ?cursor=...           continue from a previous next_cursor
+        """
+        me = request.user.username
+        post = self.get_object()
+        if blocks.is_blocked_between(me, post.user):
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            return Response({'status': 'liked', 'likes': post.no_of_likes}, status=status.HTTP_201_CREATED)
-        else:
-            # Unlike the post
-            like_filter.delete()
-            post.no_of_likes -= 1
-            post.save()
-            return Response({'status': 'unliked', 'likes': post.no_of_likes})
+        order = request.query_params.get('order', 'newest')
+        if order not in ('newest', 'oldest'):
+            return Response({'error': "order must be 'newest' or 'oldest'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            cursor = decode_cursor(request.query_params.get('cursor'))
+        except ValueError:
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows, has_more = comment_page(post.id, cursor, newest_first=(order == 'newest'),
+                                      exclude_users=blocks.blocked_either_way(me), limit=limit)
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+        serializer = CommentSerializer(rows, many=True, context={'request': request})
+        return Response({'results': serializer.data, 'next_cursor': next_cursor, 'has_more': has_more})
 
     @action(detail=False, methods=['get'])
     def feed(self, request):
-        """Get feed posts (posts from users you follow)"""
+        """
+        Get feed posts (posts from users you follow), newest first.
+        ?limit=N      page size (default 20, max 100)
+        ?cursor=...   older posts, continuing from a previous next_cursor
+        ?since=...    only posts newer than a previous newest_cursor
+        """
         me = request.user.username
 
-        # Get users I follow
-        user_following = FollowersCount.objects.filter(follower=me)
-        following_usernames = [f.user for f in user_following]
-
-        # Get blocks
-        blocked_by_me_qs = Block.objects.filter(blocker=me).values_list('blocked', flat=True)
-        blocked_me_qs = Block.objects.filter(blocked=me).values_list('blocker', flat=True)
-        blocked_by_me = set(blocked_by_me_qs)
-        blocked_me = set(blocked_me_qs)
-
-        # Build feed
-        feed = []
-        for username in following_usernames:
-            if username in blocked_by_me or username in blocked_me:
-                continue
-            qs = Post.objects.filter(user=username)
-            feed.append(qs)
-        feed_list = list(chain(*feed))
-        feed_list.sort(key=lambda x: x.created_at, reverse=True)
-
-        serializer = self.get_serializer(feed_list, many=True)
-        return Response(serializer.data)
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            before = decode_cursor(request.query_params.get('cursor'))
+            after = decode_cursor(request.query_params.get('since'))
+        except ValueError:
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Build feed page from the materialized timeline
+        feed_list, has_more = timeline.home_feed_page(
+            me, exclude_authors=blocks.blocked_either_way(me), limit=limit, before=before, after=after
+        )
+
+        newest_cursor = request.query_params.get('since') or None
+        if feed_list:
+            newest_cursor = encode_cursor(feed_list[0].created_at, feed_list[0].id)
+        next_cursor = None
+        if has_more and after is None:
+            next_cursor = encode_cursor(feed_list[-1].created_at, feed_list[-1].id)
+
+        def render():
+            serializer = self.get_serializer(feed_list, many=True)
+            return Response({
+                'results': serializer.data,
+                'next_cursor': next_cursor,
+                'newest_cursor': newest_cursor,
+                'has_more': has_more,
+            })
+
+        # the page is already loaded; validate it before paying for serialization
+        authors = self._authors_modified({p.user for p in feed_list}) if feed_list else None
+        parts = (
+            [(p.pk, p.updated_at, likes.like_counter.pending(p.id)) for p in feed_list],
+            has_more, *self._viewer_likes(request), authors,
+        )
+        last_modified = latest(authors, *(p.updated_at for p in feed_list))
+        return self.conditional(request, parts, last_modified, render)
 
     @action(detail=False, methods=['get'])
     def suggestions(self, request):
-        """Get user suggestions"""
+        """Get user suggestions (precomputed friends-of-friends, see core.suggestions)"""
         me = request.user.username
-        all_users = User.objects.exclude(username=me)
-
-        # Get users I follow
-        user_following = FollowersCount.objects.filter(follower=me)
-        following_usernames = set([f.user for f in user_following])
-
-        # Get blocks
-        blocked_by_me_qs = Block.objects.filter(blocker=me).values_list('blocked', flat=True)
-        blocked_me_qs = Block.objects.filter(blocked=me).values_list('blocker', flat=True)
-        blocked_by_me = set(blocked_by_me_qs)
-        blocked_me = set(blocked_me_qs)
-
-        exclude_usernames = following_usernames.union({me}).union(blocked_by_me).union(blocked_me)
-        suggestions = [u for u in all_users if u.username not in exclude_usernames]
-        random.shuffle(suggestions)
-
-        username_profile_list = []
-        for u in suggestions[:10]:
-            try:
-                profile = Profile.objects.get(id_user=u.id)
-                username_profile_list.append(profile)
-            except:
-                pass
-
-        serializer = ProfileSerializer(username_profile_list[:4], many=True, context={'request': request})
+
+        profiles = suggestions.get_suggestions(me, exclude=blocks.blocked_either_way(me))
+        serializer = ProfileSerializer(profiles, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def card_cache_stats(self, request):
+        """Rendered post card cache: hits, misses and version bumps (this process only)"""
+        return Response(post_cards.stats())
 
-class CommentViewSet(viewsets.ModelViewSet):
+
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Comment model.
     list: Get all comments for a post
@@ -201,22 +277,37 @@ class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    modified_field = 'updated_at'   # timestamp doesn't move when a comment is edited
 
     def get_queryset(self):
-        queryset = Comment.objects.all()
+        queryset = Comment.objects.exclude(user__in=blocks.blocked_either_way(self.request.user.username))
         post_id = self.request.query_params.get('post', None)
         if post_id:
             queryset = queryset.filter(post_id=post_id)
         return queryset.order_by('timestamp')
 
+    def _commenters_modified(self, usernames):
+        # embedded user_profile
+        return Profile.objects.filter(user__username__in=usernames).aggregate(last=Max('updated_at'))['last']
+
+    def validator_parts(self, request, queryset):
+        blocked = sorted(blocks.blocked_either_way(request.user.username))
+        return blocked, self._commenters_modified(queryset.values('user'))
+
+    def object_validator_parts(self, request, instance):
+        return (self._commenters_modified([instance.user]),)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user.username)
-        post = serializer.instance.post
+        post = serializer.validated_data['post']
+        if blocks.is_blocked_between(self.request.user.username, post.user):
+            raise PermissionDenied("You can't comment on this post.")
+        with transaction.atomic():   # with the post's comments_count
+            serializer.save(user=self.request.user.username, author=self.request.user)
         # Create notification
         if post.user != self.request.user.username:
             create_notification(
@@ -270,10 +361,10 @@ class FollowersCountViewSet(viewsets.ModelViewSet):
         follow_obj = FollowersCount.objects.filter(follower=follower, user=user).first()
 
         if follow_obj:
-            follow_obj.delete()
+            follows.unfollow_user(follower, user)
             return Response({'status': 'unfollowed'})
         else:
-            new_follower = FollowersCount.objects.create(follower=follower, user=user)
+            new_follower = follows.follow_user(follower, user)
             if follower != user:
                 create_notification(
                     to_username=user,
@@ -285,6 +376,16 @@ class FollowersCountViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(new_follower)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            follow = serializer.save()
+            follows.followed(follow.follower, follow.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            follows.unfollowed(instance.follower, instance.user)
+
     @action(detail=False, methods=['get'])
     def followers(self, request):
         """Get followers of a user"""
@@ -301,8 +402,23 @@ class FollowersCountViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(following, many=True)
         return Response(serializer.data)
 
-
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Follower/following counts for a user and how they relate to the current user"""
+        me = request.user.username
+        username = request.query_params.get('user', me)
+        return Response({
+            'user': username,
+            'followers_count': follow_graph.followers_count(username),
+            'following_count': follow_graph.following_count(username),
+            # the viewer's own follow state is exact, not from the per-process graph
+            'is_following': FollowersCount.objects.filter(follower=me, user=username).exists(),
+            'follows_you': FollowersCount.objects.filter(follower=username, user=me).exists(),
+            'mutual_following_count': len(follow_graph.common_following(me, username)),
+        })
+
+
+class NotificationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Notification model (read-only).
     list: Get all notifications for current user
@@ -311,26 +427,55 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    modified_field = 'timestamp'
 
     def get_queryset(self):
         return Notification.objects.filter(to_user=self.request.user.username).order_by('-timestamp')
 
+    def _read_state(self, request):
+        # unread count and mark-all-read watermark: every `read` flag depends on them
+        return tuple(NotificationCounter.objects.filter(owner=request.user.username)
+                     .values_list('unread', 'read_through').first() or ())
+
+    def validator_parts(self, request, queryset):
+        return self._read_state(request)
+
+    def object_validator_parts(self, request, instance):
+        return (instance.read, *self._read_state(request))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        username = self.request.user.username
+        context['read_through'] = {username: notifications.read_through(username)}
+        return context
+
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark a notification as read"""
         notification = self.get_object()
         if notification.to_user != request.user.username:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-        notification.read = True
-        notification.save()
+        if notifications.mark_read(notification):
+            realtime.publish_unread_count(request.user.username)
         return Response({'status': 'marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        Notification.objects.filter(to_user=request.user.username, read=False).update(read=True)
+        notifications.mark_all_read(request.user.username)
+        realtime.publish_unread_count(request.user.username, 0)
         return Response({'status': 'all marked as read'})
 
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Unread notification count for the badge (one counter row, no COUNT over notifications)"""
+        return Response({'unread_count': notifications.unread_count(request.user.username)})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def queue_stats(self, request):
+        """Background notification writer: queue depth and counters (this process only)"""
+        return Response(notification_queue.stats())
+
 
 class BlockViewSet(viewsets.ModelViewSet):
     """
@@ -366,19 +511,95 @@ class BlockViewSet(viewsets.ModelViewSet):
         block_obj = Block.objects.filter(blocker=blocker, blocked=blocked).first()
 
         if block_obj:
-            block_obj.delete()
+            blocks.unblock(blocker, blocked)
             # Optionally restore follow relationships
-            FollowersCount.objects.filter(follower=blocker, user=blocked).delete()
-            FollowersCount.objects.filter(follower=blocked, user=blocker).delete()
+            follows.sever_follows(blocker, blocked)
             return Response({'status': 'unblocked'})
         else:
-            block_obj = Block.objects.create(blocker=blocker, blocked=blocked)
+            block_obj, _ = blocks.block(blocker, blocked)
             # Remove follow relationships
-            FollowersCount.objects.filter(follower=blocker, user=blocked).delete()
-            FollowersCount.objects.filter(follower=blocked, user=blocker).delete()
+            follows.sever_follows(blocker, blocked)
             serializer = self.get_serializer(block_obj)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def perform_create(self, serializer):
+        block_obj = serializer.save()
+        blocks.invalidate(block_obj.blocker, block_obj.blocked)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        blocks.invalidate(instance.blocker, instance.blocked)
+
+
+class UploadSessionViewSet(viewsets.ViewSet):
+    """
+    Chunked, resumable image upload that ends in a new post.
+    create: Start an upload { filename, size, sha256, caption }
+    retrieve: Upload state; `offset` is where the next chunk goes
+    update: PUT raw bytes with an `Upload-Offset` header (or ?offset=)
+    finalize: Verify the checksum and create the post
+    destroy: Abandon the upload
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _session(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, owner=request.user.username)
+
+    def _error(self, e):
+        body = {'error': str(e)}
+        if e.offset is not None:
+            body['offset'] = e.offset
+        code = status.HTTP_409_CONFLICT if isinstance(e, (uploads.OffsetMismatch, uploads.FinalizeConflict)) else status.HTTP_400_BAD_REQUEST
+        return Response(body, status=code)
+
+    def create(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            session = uploads.start(request.user.username, data['filename'], data['size'],
+                                    data['sha256'], data.get('caption', ''))
+        except uploads.UploadError as e:
+            return self._error(e)
+        body = UploadSessionSerializer(session).data
+        body['chunk_size'] = uploads.CHUNK_SIZE
+        return Response(body, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return Response(UploadSessionSerializer(self._session(request, pk)).data)
+
+    def update(self, request, pk=None):
+        session = self._session(request, pk)
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'error': 'Upload-Offset and Content-Length are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # request.stream is the raw body; request.data is never touched, so nothing is buffered
+            new_offset = uploads.append(session, offset, request.stream, length)
+        except uploads.UploadError as e:
+            return self._error(e)
+        return Response({'offset': new_offset, 'size': session.size})
+
+    partial_update = update
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self._session(request, pk)
+        try:
+            post = uploads.finish(session)
+        except uploads.UploadError as e:
+            return self._error(e)
+        images.process(post)
+        timeline.fan_out_post(post)
+        return Response(PostSerializer(post, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, pk=None):
+        uploads.discard(self._session(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 # Authentication views
 @api_view(['POST'])
@@ -472,3 +693,61 @@ def api_user_info(request):
         'profile': profile_data
     })
 
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_search(request):
+    """
+    Full-text search over profiles and post captions, best matches first.
+    ?q=...                         search text; every word is matched as a prefix
+    ?type=all|profiles|posts       which result sets to return (default all)
+    ?limit=N&offset=N              page size (default 20, max 100) and position
+    """
+    text = request.query_params.get('q', '').strip()
+    kind = request.query_params.get('type', 'all')
+    if kind not in ('all', 'profiles', 'posts'):
+        return Response({'error': "type must be 'all', 'profiles' or 'posts'"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = parse_limit(request.query_params.get('limit'))
+        offset = max(0, int(request.query_params.get('offset') or 0))
+    except ValueError:
+        return Response({'error': 'Invalid limit or offset'}, status=status.HTTP_400_BAD_REQUEST)
+
+    hidden = blocks.blocked_either_way(request.user.username)
+    data = {'query': text}
+    has_more = False
+    # fetch one extra row per set to know whether another page exists
+    if kind in ('all', 'profiles'):
+        profiles = search.search_profiles(text, exclude_users=hidden, limit=limit + 1, offset=offset)
+        has_more |= len(profiles) > limit
+        data['profiles'] = ProfileSerializer(profiles[:limit], many=True, context={'request': request}).data
+    if kind in ('all', 'posts'):
+        posts = search.search_posts(text, exclude_users=hidden, limit=limit + 1, offset=offset)
+        has_more |= len(posts) > limit
+        data['posts'] = PostSerializer(posts[:limit], many=True, context={'request': request}).data
+    data['next_offset'] = offset + limit if has_more else None
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_typeahead(request):
+    """
+    Username suggestions for a search box, answered from the in-memory index.
+    ?q=...      username prefix (case-insensitive)
+    ?limit=N    number of suggestions (default 8, max 20)
+    """
+    me = request.user.username
+    try:
+        limit = parse_limit(request.query_params.get('limit'), default=typeahead.DEFAULT_LIMIT,
+                            maximum=typeahead.MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    matches = username_index.suggest(request.query_params.get('q', ''), me,
+                                     exclude=blocks.blocked_either_way(me), limit=limit)
+    return Response({'results': [
+        {'username': username, 'avatar_url': request.build_absolute_uri(avatar), 'is_following': following}
+        for username, avatar, following in matches
+    ]})
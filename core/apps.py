@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import retention, signals  # noqa: F401 (connects the search index receivers)
+        retention.start_periodic_pruning()
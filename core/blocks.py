@@ -0,0 +1,63 @@
+# core/blocks.py
+"""
+Cached block sets.
+
+For each user the cache holds two sets: who they blocked and who blocked them.
+Both come from one Block query and are invalidated for both users whenever a
+block is created or removed, so feed, profile, suggestion and comment paths ask
+here instead of querying Block on every request.
+
+The entries live in Django's cache (CACHES['default']). With a per-process cache
+such as the default LocMemCache, other workers only see a change once their copy
+expires after BLOCK_CACHE_TIMEOUT seconds; use a shared cache backend when
+running several workers.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Block
+
+CACHE_TIMEOUT = getattr(settings, 'BLOCK_CACHE_TIMEOUT', 300)
+
+
+def _key(username):
+    return f'blocks:{username}'
+
+
+def block_sets(username):
+    """(blocked_by_me, blocked_me) for `username`, as frozensets of usernames."""
+    sets = cache.get(_key(username))
+    if sets is None:
+        rows = Block.objects.filter(Q(blocker=username) | Q(blocked=username)).values_list('blocker', 'blocked')
+        blocked_by_me = frozenset(blocked for blocker, blocked in rows if blocker == username)
+        blocked_me = frozenset(blocker for blocker, blocked in rows if blocked == username)
+        sets = (blocked_by_me, blocked_me)
+        cache.set(_key(username), sets, CACHE_TIMEOUT)
+    return sets
+
+
+def blocked_either_way(username):
+    """Usernames that `username` blocked or that blocked `username`."""
+    blocked_by_me, blocked_me = block_sets(username)
+    return blocked_by_me | blocked_me
+
+
+def is_blocked_between(a, b):
+    """True if either user has blocked the other."""
+    return b in blocked_either_way(a)
+
+
+def invalidate(*usernames):
+    cache.delete_many([_key(u) for u in usernames])
+
+
+def block(blocker, blocked):
+    obj, created = Block.objects.get_or_create(blocker=blocker, blocked=blocked)
+    invalidate(blocker, blocked)
+    return obj, created
+
+
+def unblock(blocker, blocked):
+    Block.objects.filter(blocker=blocker, blocked=blocked).delete()
+    invalidate(blocker, blocked)
@@ -0,0 +1,101 @@
+# core/comments.py
+"""
+Comment loading for post lists.
+
+Feed and profile pages show only the latest LATEST_N comments under each post.
+They are fetched for the whole page in one query - ROW_NUMBER() over a
+per-post partition, newest first, keeping rows numbered <= N - and grouped
+into a {post_id: [Comment, ...]} mapping, so templates never scan other posts'
+comments. COUNT(*) over the same partition says how many older comments are
+left for the "load more" link, which pages backwards with a (timestamp, id)
+cursor (see comment_page, also behind /api/posts/<id>/comments/).
+"""
+from django.conf import settings
+from django.db import connection
+
+from .models import Comment
+from .pagination import encode_cursor, keyset_q
+
+LATEST_N = getattr(settings, 'FEED_COMMENTS_PER_POST', 3)
+
+
+def latest_by_post(post_ids, exclude_users=(), n=LATEST_N):
+    """
+    {post_id: (comments oldest first, total)} for the latest `n` comments on
+    each post, skipping comments by `exclude_users`. Posts without comments are
+    left out.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    exclude_users = list(exclude_users)
+    qn = connection.ops.quote_name
+    table = Comment._meta.db_table
+    post_col = qn(Comment._meta.get_field('post').column)
+    user_col = qn(Comment._meta.get_field('user').column)
+    prep = Comment._meta.get_field('post').target_field.get_db_prep_value
+
+    where = [f"{post_col} IN ({', '.join(['%s'] * len(post_ids))})"]
+    params = [prep(pk, connection) for pk in post_ids]
+    if exclude_users:
+        where.append(f"{user_col} NOT IN ({', '.join(['%s'] * len(exclude_users))})")
+        params.extend(exclude_users)
+    params.append(n)
+
+    sql = f"""
+        SELECT * FROM (
+            SELECT {qn(table)}.*,
+                   ROW_NUMBER() OVER (PARTITION BY {post_col} ORDER BY timestamp DESC, id DESC) AS position,
+                   COUNT(*) OVER (PARTITION BY {post_col}) AS total
+            FROM {qn(table)}
+            WHERE {' AND '.join(where)}
+        ) ranked
+        WHERE position <= %s
+        ORDER BY timestamp, id
+    """
+    grouped = {}
+    for comment in Comment.objects.raw(sql, params):
+        shown, _ = grouped.get(comment.post_id, ([], 0))
+        shown.append(comment)
+        grouped[comment.post_id] = (shown, comment.total)
+    return grouped
+
+
+def attach_latest(posts, exclude_users=(), n=LATEST_N):
+    """
+    Set `latest_comments` (oldest first), `older_comment_count` and
+    `older_comments_cursor` (for the "load more" request) on each post and
+    return the posts as a list.
+    """
+    posts = list(posts)
+    grouped = latest_by_post([p.pk for p in posts], exclude_users, n)
+    for post in posts:
+        shown, total = grouped.get(post.pk, ([], 0))
+        post.latest_comments = shown
+        post.older_comment_count = total - len(shown)
+        post.older_comments_cursor = (encode_cursor(shown[0].timestamp, shown[0].id)
+                                      if post.older_comment_count else None)
+    return posts
+
+
+def comment_page(post_id, cursor=None, newest_first=True, exclude_users=(), limit=20):
+    """
+    (comments in the requested order, has_more): up to `limit` comments on
+    `post_id` after the (timestamp, id) `cursor` in that order. One indexed
+    range scan; no OFFSET and no total count.
+    """
+    qs = Comment.objects.filter(post_id=post_id).exclude(user__in=list(exclude_users))
+    if cursor is not None:
+        qs = qs.filter(keyset_q(cursor, 'lt' if newest_first else 'gt', ts_field='timestamp'))
+    order = ('-timestamp', '-id') if newest_first else ('timestamp', 'id')
+    rows = list(qs.order_by(*order)[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def older_comments(post_id, before, exclude_users=(), limit=20):
+    """
+    (comments oldest first, has_more): up to `limit` comments on `post_id`
+    older than the (timestamp, id) cursor `before`.
+    """
+    rows, has_more = comment_page(post_id, before, newest_first=True, exclude_users=exclude_users, limit=limit)
+    return rows[::-1], has_more
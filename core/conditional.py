@@ -0,0 +1,90 @@
+# core/conditional.py
+"""
+Conditional GET for the read API.
+
+ConditionalGetMixin gives a viewset's list and retrieve (and any action that
+calls `self.conditional`) an ETag and a Last-Modified header computed from a
+few aggregate values instead of the response body: by default COUNT(*) and
+MAX(<modified_field>) over the filtered queryset, plus whatever
+`validator_parts` adds for data nested from other tables (author profiles, the
+viewer's likes, read state, ...). When the request's If-None-Match /
+If-Modified-Since still match, the view answers 304 before anything is
+serialized.
+
+The ETag also covers the viewset, the full request path (filters, page) and
+the user, since bodies differ per viewer; responses are marked
+`Cache-Control: private, no-cache` so shared caches don't store them and
+browsers always revalidate. Last-Modified only has one-second resolution and
+can't see deletions, so If-None-Match wins whenever both are sent.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    return 'W/"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def latest(*values):
+    """The newest of several datetimes, ignoring None."""
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+class ConditionalGetMixin:
+    """
+    modified_field: timestamp column that moves whenever a row's representation
+                    changes (for list validators and Last-Modified)
+    """
+    modified_field = None
+
+    def validator_parts(self, request, queryset):
+        """Extra values that change when nested / per-viewer data changes. Override."""
+        return ()
+
+    def object_validator_parts(self, request, instance):
+        """Like validator_parts, for a single object. Override."""
+        return ()
+
+    def list_validators(self, request):
+        """(etag parts, last modified) for the list endpoint."""
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        summary = queryset.aggregate(n=Count('pk'), last=Max(self.modified_field))
+        return (summary['n'], summary['last'], *self.validator_parts(request, queryset)), summary['last']
+
+    def object_validators(self, request, instance):
+        modified = getattr(instance, self.modified_field)
+        return (instance.pk, modified, *self.object_validator_parts(request, instance)), modified
+
+    def conditional(self, request, parts, last_modified, render):
+        """
+        A 304 if the client's copy matches `parts` / `last_modified`,
+        otherwise `render()` with the validators attached.
+        """
+        etag = make_etag(type(self).__name__, request.get_full_path(), request.user.pk, parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie', 'Authorization'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        parts, last_modified = self.list_validators(request)
+        return self.conditional(request, parts, last_modified,
+                                lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        parts, last_modified = self.object_validators(request, instance)
+        return self.conditional(request, parts, last_modified,
+                                lambda: Response(self.get_serializer(instance).data))
@@ -0,0 +1,95 @@
+# core/counters.py
+"""
+Denormalized counts: Profile.followers_count / following_count / posts_count
+and Post.comments_count.
+
+Each write path adjusts the stored count with a single
+`count = GREATEST(count + delta, 0)` UPDATE in the same transaction as the row
+it counts - follows through core.follows, posts and comments through the
+signals in core/signals.py - so pages and serializers read the numbers off
+rows they already have instead of running COUNT(*) queries.
+
+`manage.py reconcile_counters` recomputes everything from the source tables
+(reconcile_profiles / reconcile_posts below) if the counts ever drift.
+"""
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Comment, FollowersCount, Post, Profile
+
+
+def _adjust(queryset, **deltas):
+    # update() skips auto_now, so updated_at (the API's Last-Modified) is set here
+    queryset.update(updated_at=timezone.now(), **{field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()})
+
+
+def followed(follower, user, delta=1):
+    _adjust(Profile.objects.filter(user__username=follower), following_count=delta)
+    _adjust(Profile.objects.filter(user__username=user), followers_count=delta)
+
+
+def unfollowed(follower, user):
+    followed(follower, user, delta=-1)
+
+
+def post_added(username, delta=1):
+    _adjust(Profile.objects.filter(user__username=username), posts_count=delta)
+
+
+def post_removed(username):
+    post_added(username, delta=-1)
+
+
+def comment_added(post_id, delta=1):
+    _adjust(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def comment_removed(post_id):
+    comment_added(post_id, delta=-1)
+
+
+# --- reconciliation ----------------------------------------------------------
+
+def _grouped(queryset, field, distinct=None):
+    # order_by() keeps any default ordering out of the GROUP BY
+    rows = (queryset.order_by().values(field)
+            .annotate(n=Count(distinct or 'pk', distinct=bool(distinct)))
+            .values_list(field, 'n'))
+    return dict(rows)
+
+
+def reconcile_profiles(profiles):
+    """
+    Recompute the three counts for `profiles` (with `user` loaded) in three
+    grouped queries; writes only rows that changed. Returns how many did.
+    """
+    names = [p.user.username for p in profiles]
+    followers = _grouped(FollowersCount.objects.filter(user__in=names), 'user', distinct='follower')
+    following = _grouped(FollowersCount.objects.filter(follower__in=names), 'follower', distinct='user')
+    posts = _grouped(Post.objects.filter(user__in=names), 'user')
+    fixed = 0
+    for p in profiles:
+        name = p.user.username
+        actual = dict(followers_count=followers.get(name, 0),
+                      following_count=following.get(name, 0),
+                      posts_count=posts.get(name, 0))
+        if any(getattr(p, field) != value for field, value in actual.items()):
+            Profile.objects.filter(pk=p.pk).update(updated_at=timezone.now(), **actual)
+            fixed += 1
+    return fixed
+
+
+def reconcile_posts(rows):
+    """
+    Recompute comments_count for [(post_id, stored_count)] in one grouped
+    query; writes only rows that changed. Returns how many did.
+    """
+    counts = _grouped(Comment.objects.filter(post__in=[pk for pk, _ in rows]), 'post')
+    fixed = 0
+    for pk, stored in rows:
+        actual = counts.get(pk, 0)
+        if stored != actual:
+            Post.objects.filter(pk=pk).update(comments_count=actual, updated_at=timezone.now())
+            fixed += 1
+    return fixed
@@ -0,0 +1,47 @@
+# core/follows.py
+"""
+Follow / unfollow writes.
+
+Every change to FollowersCount goes through these helpers so the structures
+derived from it (profile counts, home timelines, the in-process follow graph)
+stay in step.
+"""
+from django.db import transaction
+
+from .models import FollowersCount
+from .graph import follow_graph
+from . import counters, timeline
+
+
+def followed(follower, user):
+    """Side effects of a new FollowersCount row (call in the transaction that saved it)."""
+    counters.followed(follower, user)
+    follow_graph.add_edge(follower, user)
+    timeline.backfill_follow(follower, user)
+
+
+def unfollowed(follower, user):
+    """Side effects of a removed FollowersCount row (call in the transaction that deleted it)."""
+    counters.unfollowed(follower, user)
+    follow_graph.remove_edge(follower, user)
+    timeline.remove_follow(follower, user)
+
+
+def follow_user(follower, user):
+    with transaction.atomic():
+        row = FollowersCount.objects.create(follower=follower, user=user)
+        followed(follower, user)
+    return row
+
+
+def unfollow_user(follower, user):
+    with transaction.atomic():
+        deleted, _ = FollowersCount.objects.filter(follower=follower, user=user).delete()
+        if deleted:
+            unfollowed(follower, user)
+
+
+def sever_follows(a, b):
+    """Remove follows in both directions between `a` and `b` (used by block)."""
+    unfollow_user(a, b)
+    unfollow_user(b, a)
@@ -0,0 +1,249 @@
+# core/graph.py
+"""
+In-process follow graph index.
+
+Mirrors FollowersCount as integer-id adjacency lists so follower/following
+counts, "does A follow B" and mutual-follow lookups are answered from memory
+instead of COUNT(*)/EXISTS queries on the username columns.
+
+Each user gets a dense integer id; every node has two sorted array('l')
+neighbor lists (who they follow, who follows them). Counts are len(), membership
+is a bisect, and intersections are a linear merge of two sorted arrays.
+
+The index is per process. It loads itself from FollowersCount on first read,
+is updated by the follow/unfollow/block paths (see core.follows) once their
+transaction commits, and reloads
+when older than FOLLOW_GRAPH_MAX_AGE seconds so workers that didn't see a write
+converge. A reload builds a new graph and swaps it in with one assignment, so
+readers never see a half-filled one.
+
+Because another worker's copy can be up to FOLLOW_GRAPH_MAX_AGE seconds
+behind, answers that must be exact - whether the viewer follows someone, which
+authors are on the pull path - are read from the database instead.
+`manage.py rebuild_follow_graph` loads a graph in its own process to report
+size and load time; it does not refresh running servers.
+"""
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import FollowersCount
+
+MAX_AGE = getattr(settings, 'FOLLOW_GRAPH_MAX_AGE', 300)
+
+
+def _contains(arr, value):
+    i = bisect_left(arr, value)
+    return i < len(arr) and arr[i] == value
+
+
+def _insert(arr, value):
+    i = bisect_left(arr, value)
+    if i < len(arr) and arr[i] == value:
+        return False
+    arr.insert(i, value)
+    return True
+
+
+def _remove(arr, value):
+    i = bisect_left(arr, value)
+    if i < len(arr) and arr[i] == value:
+        del arr[i]
+        return True
+    return False
+
+
+def _intersect(a, b):
+    """Merge-intersect two sorted arrays."""
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            out.append(a[i])
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+class _Adjacency:
+    """One complete copy of the graph; a reload builds a new one and swaps it in."""
+
+    def __init__(self):
+        self.ids = {}          # username -> int id
+        self.names = []        # int id -> username
+        self.following = []    # int id -> sorted array of ids this user follows
+        self.followers = []    # int id -> sorted array of ids following this user
+
+    def id(self, username, create=False):
+        uid = self.ids.get(username)
+        if uid is None and create:
+            uid = len(self.names)
+            self.following.append(array('l'))
+            self.followers.append(array('l'))
+            self.names.append(username)
+            self.ids[username] = uid   # last, so readers never see an id without its lists
+        return uid
+
+
+class FollowGraph:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._loaded_at = None
+        self._graph = _Adjacency()
+        self._replay = None     # edge writes made while a rebuild is reading
+
+    # -- loading -----------------------------------------------------------
+
+    def rebuild(self):
+        """Reload the whole index from FollowersCount."""
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # built off to the side: readers keep using the old graph until the swap
+        with self._lock:
+            self._replay = []
+        graph = _Adjacency()
+        try:
+            rows = FollowersCount.objects.values_list('follower', 'user').iterator()
+            for follower, user in rows:
+                a = graph.id(follower, create=True)
+                b = graph.id(user, create=True)
+                graph.following[a].append(b)
+                graph.followers[b].append(a)
+            # sort + dedupe every neighbor list once instead of inserting in order
+            for lists in (graph.following, graph.followers):
+                for i, arr in enumerate(lists):
+                    lists[i] = array('l', sorted(set(arr)))
+            with self._lock:
+                # writes that raced with the read above may be missing from it
+                for apply, follower, user in self._replay:
+                    apply(graph, follower, user)
+                self._graph = graph
+                self._loaded_at = time.monotonic()
+        finally:
+            self._replay = None
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > MAX_AGE
+
+    def _ensure_loaded(self):
+        if self._stale():
+            if self._loaded_at is None:
+                self.rebuild()
+            elif self._rebuild_lock.acquire(blocking=False):
+                # one thread reloads; the others keep reading the current graph
+                try:
+                    if self._stale():
+                        self._rebuild()
+                finally:
+                    self._rebuild_lock.release()
+        return self._graph
+
+    def invalidate(self):
+        """Force a reload on next access."""
+        self._loaded_at = None
+
+    # -- writes ------------------------------------------------------------
+
+    @staticmethod
+    def _link(graph, follower, user):
+        a = graph.id(follower, create=True)
+        b = graph.id(user, create=True)
+        _insert(graph.following[a], b)
+        _insert(graph.followers[b], a)
+
+    @staticmethod
+    def _unlink(graph, follower, user):
+        a = graph.id(follower)
+        b = graph.id(user)
+        if a is None or b is None:
+            return
+        _remove(graph.following[a], b)
+        _remove(graph.followers[b], a)
+
+    def _write(self, apply, follower, user):
+        # never loads on the write path: an unloaded graph reads the edge from
+        # the table when it first loads, and a stale one reloads on the next read
+        with self._lock:
+            if self._loaded_at is None and self._replay is None:
+                return
+            apply(self._graph, follower, user)
+            if self._replay is not None:
+                self._replay.append((apply, follower, user))
+
+    def add_edge(self, follower, user):
+        """Apply a follow once the surrounding transaction commits (at once outside one)."""
+        transaction.on_commit(lambda: self._write(self._link, follower, user))
+
+    def remove_edge(self, follower, user):
+        transaction.on_commit(lambda: self._write(self._unlink, follower, user))
+
+    # -- reads -------------------------------------------------------------
+    # each read takes one reference to the current graph and uses only that,
+    # so a concurrent reload can't mix two versions
+
+    @staticmethod
+    def _neighbors(graph, direction, username):
+        uid = graph.id(username)
+        return getattr(graph, direction)[uid] if uid is not None else array('l')
+
+    def followers_count(self, username):
+        return len(self._neighbors(self._ensure_loaded(), 'followers', username))
+
+    def following_count(self, username):
+        return len(self._neighbors(self._ensure_loaded(), 'following', username))
+
+    @staticmethod
+    def _sampled(ids, sample):
+        # pick on the integer ids, before any usernames are looked up
+        return random.sample(ids, sample) if sample is not None and len(ids) > sample else ids
+
+    def followers(self, username, sample=None):
+        """Usernames following `username`; at most `sample` of them, chosen at random."""
+        graph = self._ensure_loaded()
+        return [graph.names[i] for i in self._sampled(self._neighbors(graph, 'followers', username), sample)]
+
+    def following(self, username, sample=None):
+        """Usernames `username` follows; at most `sample` of them, chosen at random."""
+        graph = self._ensure_loaded()
+        return [graph.names[i] for i in self._sampled(self._neighbors(graph, 'following', username), sample)]
+
+    def is_following(self, follower, user):
+        graph = self._ensure_loaded()
+        b = graph.id(user)
+        return b is not None and _contains(self._neighbors(graph, 'following', follower), b)
+
+    def mutual_follows(self, username):
+        """Users who both follow `username` and are followed back."""
+        graph = self._ensure_loaded()
+        ids = _intersect(self._neighbors(graph, 'following', username),
+                         self._neighbors(graph, 'followers', username))
+        return [graph.names[i] for i in ids]
+
+    def common_following(self, a, b):
+        """Users followed by both `a` and `b`."""
+        graph = self._ensure_loaded()
+        ids = _intersect(self._neighbors(graph, 'following', a), self._neighbors(graph, 'following', b))
+        return [graph.names[i] for i in ids]
+
+    def stats(self):
+        graph = self._ensure_loaded()
+        return {
+            'users': len(graph.names),
+            'edges': sum(len(arr) for arr in graph.following),
+        }
+
+
+follow_graph = FollowGraph()
@@ -0,0 +1,153 @@
+# core/images.py
+"""
+Image derivatives.
+
+When a post image or profile picture is uploaded we keep the original and also
+write smaller copies, so list views don't ship multi-megabyte originals for a
+40px avatar:
+
+  Post.image          -> image_thumb (320x320 JPEG, centre-cropped)
+                         image_webp  (WebP, longest side <= 1080)
+  Profile.profileimg  -> profileimg_thumb (96x96 JPEG, centre-cropped)
+                         profileimg_webp  (WebP, longest side <= 320)
+
+The original's width/height are stored too (Post.image_width/image_height).
+Rendering is a pure function of the source bytes (`render`) so `manage.py
+generate_image_variants` can run it in a process pool and only touch the
+database from the parent.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# field -> (size, format, crop to square?)
+POST_VARIANTS = {
+    'image_thumb': (320, 'JPEG', True),
+    'image_webp': (1080, 'WEBP', False),
+}
+PROFILE_VARIANTS = {
+    'profileimg_thumb': (96, 'JPEG', True),
+    'profileimg_webp': (320, 'WEBP', False),
+}
+QUALITY = {'JPEG': 82, 'WEBP': 80}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+SUFFIXES = {'image_thumb': 'thumb', 'image_webp': 'web',
+            'profileimg_thumb': 'thumb', 'profileimg_webp': 'web'}
+
+
+def variants_for(instance):
+    """(source field name, variants, dimension fields) for a Post or Profile (instance or class)."""
+    if instance._meta.model_name == 'post':
+        return 'image', POST_VARIANTS, ('image_width', 'image_height')
+    return 'profileimg', PROFILE_VARIANTS, None
+
+
+def render(fileobj, variants):
+    """
+    Build the derivatives of one image.
+    Returns ((width, height), {field: (extension, bytes)}).
+    """
+    with Image.open(fileobj) as img:
+        img = ImageOps.exif_transpose(img)   # phone photos carry rotation in EXIF
+        size = img.size
+        out = {}
+        for field, (px, fmt, crop) in variants.items():
+            im = img.convert('RGBA' if fmt == 'WEBP' and img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            if crop:
+                im = ImageOps.fit(im, (px, px), Image.LANCZOS)
+            else:
+                im.thumbnail((px, px), Image.LANCZOS)
+            buf = io.BytesIO()
+            im.save(buf, fmt, quality=QUALITY[fmt], optimize=fmt == 'JPEG')
+            out[field] = (EXTENSIONS[fmt], buf.getvalue())
+    return size, out
+
+
+def apply(instance, size, rendered):
+    """Save rendered derivatives onto `instance` and persist just those fields."""
+    source_field, _, dims = variants_for(instance)
+    base = os.path.splitext(os.path.basename(getattr(instance, source_field).name))[0]
+    update_fields = []
+    for field, (ext, data) in rendered.items():
+        old = getattr(instance, field)
+        if old:
+            old.delete(save=False)
+        getattr(instance, field).save(f"{base}_{SUFFIXES[field]}.{ext}", ContentFile(data), save=False)
+        update_fields.append(field)
+    if dims:
+        setattr(instance, dims[0], size[0])
+        setattr(instance, dims[1], size[1])
+        update_fields.extend(dims)
+    instance.save(update_fields=update_fields + ['updated_at'])
+
+
+def process(instance):
+    """
+    Generate derivatives for a freshly uploaded image. Unreadable images are
+    left without derivatives (the serializers fall back to the original).
+    Returns True if derivatives were written.
+    """
+    source_field, variants, _ = variants_for(instance)
+    source = getattr(instance, source_field)
+    if not source or source.name == source.field.default:
+        return False
+    try:
+        source.open('rb')
+        try:
+            size, rendered = render(source, variants)
+        finally:
+            source.close()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    apply(instance, size, rendered)
+    return True
+
+
+def delete_variants(instance):
+    _, variants, _ = variants_for(instance)
+    for field in variants:
+        f = getattr(instance, field)
+        if f:
+            f.delete(save=False)
+
+
+def delete_files(instance):
+    """
+    Release the original and its derivatives. With content-addressed storage
+    each delete drops one reference; the file goes with the last one.
+    """
+    source_field, _, _ = variants_for(instance)
+    source = getattr(instance, source_field)
+    if source and source.name != source.field.default:
+        source.delete(save=False)
+    delete_variants(instance)
+
+
+def replace(instance, old_name):
+    """
+    A new original has just been saved over `old_name`: release the old
+    original and its derivatives, then render derivatives for the new one.
+    Returns True if derivatives were written.
+    """
+    source_field, variants, _ = variants_for(instance)
+    source = getattr(instance, source_field)
+    if old_name and old_name != source.field.default:
+        # even when the bytes are identical: the new save took its own reference
+        source.storage.delete(old_name)
+    delete_variants(instance)
+    if process(instance):
+        return True
+    # unreadable upload: don't leave the old image's derivatives pointing elsewhere
+    instance.save(update_fields=list(variants) + ['updated_at'])
+    return False
+
+
+def variant_url(instance, field, request=None):
+    """URL of a derivative, falling back to the original image."""
+    source_field, _, _ = variants_for(instance)
+    f = getattr(instance, field) or getattr(instance, source_field)
+    if not f:
+        return None
+    return request.build_absolute_uri(f.url) if request else f.url
@@ -0,0 +1,137 @@
+# core/likes.py
+"""
+Likes: idempotent like/unlike and a write-coalescing like counter.
+
+LikePost rows are the source of truth and are unique per (post, liker), so a
+like is a single INSERT that either succeeds or hits the constraint - no
+read-then-write race. Post.no_of_likes is a denormalized count; rather than
+rewriting the Post row on every like, deltas are buffered per post in process
+memory and flushed as one `no_of_likes = no_of_likes + n` UPDATE per post every
+LIKE_COUNTER_FLUSH_INTERVAL seconds. A burst of likes on a hot post becomes a
+single row write instead of serializing every liker on that row.
+
+Set LIKE_COUNTER_FLUSH_INTERVAL = 0 to write every delta through immediately.
+A delta whose write fails stays buffered and is retried on the next flush. If a
+process dies with unflushed deltas, `manage.py reconcile_like_counts`
+recomputes the counts from LikePost.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post, LikePost
+from . import post_cards
+
+FLUSH_INTERVAL = getattr(settings, 'LIKE_COUNTER_FLUSH_INTERVAL', 2.0)
+
+logger = logging.getLogger(__name__)
+
+
+class LikeCounter:
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._flusher = None
+
+    def add(self, post_id, delta):
+        """Buffer `delta` for `post_id`; returns True if it was written straight through."""
+        if not delta:
+            return False
+        if not self.flush_interval:
+            self._write(post_id, delta)
+            return True
+        with self._lock:
+            self._pending[post_id] += delta
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='like-counter-flush', daemon=True)
+                self._flusher.start()
+        return False
+
+    def pending(self, post_id):
+        """Delta for `post_id` not yet written to Post.no_of_likes."""
+        return self._pending.get(post_id, 0)
+
+    def snapshot(self):
+        """{post_id: delta} for everything not yet written."""
+        with self._lock:
+            return {pk: delta for pk, delta in self._pending.items() if delta}
+
+    def flush(self):
+        """Write the buffered deltas; returns how many posts were written."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        written = 0
+        for post_id, delta in pending.items():
+            if not delta:
+                continue
+            try:
+                self._write(post_id, delta)
+            except Exception:
+                # e.g. "database is locked": keep the delta for the next flush
+                logger.exception("like counter: writing %+d for post %s failed", delta, post_id)
+                with self._lock:
+                    self._pending[post_id] += delta
+            else:
+                written += 1
+        return written
+
+    def _write(self, post_id, delta):
+        Post.objects.filter(id=post_id).update(no_of_likes=F('no_of_likes') + delta, updated_at=timezone.now())
+        post_cards.bump(post_id)   # the rendered card shows the count
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # the flusher must outlive any one bad flush
+                logger.exception("like counter: flush failed")
+            finally:
+                close_old_connections()
+
+
+like_counter = LikeCounter()
+atexit.register(like_counter.flush)
+
+
+def like(post, username, user=None):
+    """
+    Record a like; returns True if it's new, False if it already existed.
+    Pass the liker's `user` when it's at hand so saving doesn't look it up.
+    """
+    try:
+        with transaction.atomic():
+            LikePost.objects.create(post_id=str(post.id), username=username, liked_post=post, liker=user)
+    except IntegrityError:
+        return False
+    _counted(post, 1)
+    return True
+
+
+def unlike(post, username):
+    """Remove a like; returns True if there was one."""
+    deleted, _ = LikePost.objects.filter(post_id=str(post.id), username=username).delete()
+    if deleted:
+        _counted(post, -1)
+    return bool(deleted)
+
+
+def _counted(post, delta):
+    if like_counter.add(post.id, delta):
+        # written through: the loaded no_of_likes no longer matches the row
+        post.refresh_from_db(fields=['no_of_likes'])
+
+
+def like_count(post):
+    """Post.no_of_likes including increments still waiting in the buffer."""
+    return post.no_of_likes + like_counter.pending(post.id)
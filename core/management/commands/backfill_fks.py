@@ -0,0 +1,83 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, When, Value
+
+from core.models import Post, LikePost, FollowersCount, Notification, Comment, Block
+
+MODELS = (Post, LikePost, FollowersCount, Notification, Comment, Block)
+
+
+def resolve_users(values):
+    return dict(User.objects.filter(username__in=values).values_list('username', 'id'))
+
+
+def resolve_posts(values):
+    ids = []
+    for v in values:
+        try:
+            ids.append(uuid.UUID(str(v)))
+        except ValueError:
+            pass
+    return {str(pk): pk for pk in Post.objects.filter(id__in=ids).values_list('id', flat=True)}
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the integer foreign keys (Post.author, LikePost.liker/liked_post, ...) from the "
+        "legacy username / id string columns, a small primary-key chunk per transaction. "
+        "Safe to stop and re-run: only rows whose FK is still empty are visited."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help="Seconds to pause between chunks so other writers get the lock")
+        parser.add_argument('--model', action='append', dest='models',
+                            help="Only backfill these models (e.g. --model Post --model Block)")
+
+    def handle(self, *args, **options):
+        wanted = {m.lower() for m in options['models'] or []}
+        for model in MODELS:
+            if wanted and model.__name__.lower() not in wanted:
+                continue
+            for fk, column in model.username_refs.items():
+                self.backfill(model, fk, column, resolve_users, options)
+            for fk, column in model.post_refs.items():
+                self.backfill(model, fk, column, resolve_posts, options)
+
+    def backfill(self, model, fk, column, resolve, options):
+        chunk_size = options['chunk_size']
+        pending = model.objects.filter(**{f'{fk}__isnull': True}).exclude(**{column: ''}).exclude(**{f'{column}__isnull': True})
+        last_pk = None
+        updated = skipped = 0
+
+        while True:
+            qs = pending.order_by('pk')
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            rows = list(qs.values_list('pk', column)[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            targets = resolve({value for _, value in rows})
+            matched = [(pk, value) for pk, value in rows if str(value) in targets]
+            skipped += len(rows) - len(matched)
+            if matched:
+                # one UPDATE per chunk: CASE <column> WHEN 'alice' THEN 7 WHEN ... END
+                values = {str(v) for _, v in matched}
+                target = Case(*[When(**{column: v}, then=Value(targets[v])) for v in values],
+                              output_field=model._meta.get_field(fk).target_field)
+                with transaction.atomic():
+                    updated += (model.objects
+                                .filter(pk__in=[pk for pk, _ in matched])
+                                .update(**{fk: target}))
+            time.sleep(options['sleep'])
+
+        self.stdout.write(
+            f"{model.__name__}.{fk}: {updated} row(s) filled, {skipped} without a matching target"
+        )
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import uploads
+from core.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads (and their part files) that were started but not finished."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=int, default=24,
+                            help="Only sessions not touched for this long")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+        # 'finalizing' rows this old belong to a worker that died mid-finalize
+        stale = UploadSession.objects.filter(status__in=('open', 'finalizing'), updated_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            uploads.discard(session)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Removed {count} abandoned upload(s)."))
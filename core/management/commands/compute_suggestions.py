@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import suggestions
+
+
+class Command(BaseCommand):
+    help = "Precompute the top-N 'users you may follow' suggestions for each user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help="Only refresh these users (default: everyone)")
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if not usernames:
+            usernames = User.objects.order_by('id').values_list('username', flat=True).iterator()
+
+        users = rows = 0
+        for username in usernames:
+            rows += suggestions.refresh_for(username)
+            users += 1
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} suggestion(s) for {users} user(s)."))
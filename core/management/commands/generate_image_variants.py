@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from PIL import Image
+
+from core import images
+from core.models import Post, Profile
+
+
+def render_stored(name, variants):
+    """Runs in a worker process: storage reads and Pillow only, no database."""
+    try:
+        with default_storage.open(name, 'rb') as f:
+            return images.render(f, variants)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate thumbnails / WebP variants (and stored dimensions) for existing post images and "
+        "profile pictures. Images are decoded in a process pool; the parent saves the results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help="Images handed to the pool per round")
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist")
+        parser.add_argument('--model', choices=['post', 'profile'], action='append', dest='models')
+
+    def handle(self, *args, **options):
+        models = options['models'] or ['post', 'profile']
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            if 'post' in models:
+                pending = Post.objects.exclude(image='')
+                if not options['force']:
+                    pending = pending.filter(image_thumb='')
+                self.backfill(pool, pending, images.POST_VARIANTS, options['chunk_size'])
+            if 'profile' in models:
+                pending = (Profile.objects
+                           .exclude(profileimg='')
+                           .exclude(profileimg=Profile._meta.get_field('profileimg').default))
+                if not options['force']:
+                    pending = pending.filter(profileimg_thumb='')
+                self.backfill(pool, pending, images.PROFILE_VARIANTS, options['chunk_size'])
+
+    def backfill(self, pool, pending, variants, chunk_size):
+        model = pending.model
+        source_field = images.variants_for(model)[0]
+        last_pk = None
+        done = failed = 0
+
+        while True:
+            qs = pending.order_by('pk')
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            batch = list(qs[:chunk_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            names = [getattr(obj, source_field).name for obj in batch]
+            for obj, result in zip(batch, pool.map(render_stored, names, [variants] * len(names))):
+                if result is None:
+                    failed += 1
+                    continue
+                images.apply(obj, *result)
+                done += 1
+
+        self.stdout.write(f"{model.__name__}: {done} image(s) processed, {failed} unreadable")
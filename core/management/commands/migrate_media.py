@@ -0,0 +1,82 @@
+from django.core.files.storage import FileSystemStorage, default_storage, get_storage_class
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Post, Profile, MediaBlob
+from core.storage import ContentAddressedStorage
+
+FIELDS = (
+    (Post, ('image', 'image_thumb', 'image_webp')),
+    (Profile, ('profileimg', 'profileimg_thumb', 'profileimg_webp')),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move media stored before content-addressed storage was enabled into the hashed layout "
+        "and rewrite Post.image / Profile.profileimg (and their variants) to the new paths. "
+        "Identical files collapse into one. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help="Leave the old files in place after rewriting the paths")
+
+    def handle(self, *args, **options):
+        if not issubclass(get_storage_class(), ContentAddressedStorage):
+            raise CommandError("DEFAULT_FILE_STORAGE is not core.storage.ContentAddressedStorage")
+        # plain filesystem access to the old files, so reading/deleting them skips the refcounting
+        legacy = FileSystemStorage()
+        moved = {}   # old name -> new name; several rows can share one old file
+
+        for model, fields in FIELDS:
+            for field in fields:
+                self.migrate_field(model, field, legacy, moved, options)
+
+        if not options['dry_run'] and not options['keep_originals']:
+            for old, new in moved.items():
+                if old != new and legacy.exists(old):
+                    legacy.delete(old)
+
+    def migrate_field(self, model, field, legacy, moved, options):
+        default = model._meta.get_field(field).default
+        qs = model.objects.exclude(**{field: ''}).order_by('pk')
+        if isinstance(default, str) and default:
+            qs = qs.exclude(**{field: default})
+        count = missing = 0
+        last_pk = None
+
+        while True:
+            chunk = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+            rows = list(chunk.values_list('pk', field)[:options['chunk_size']])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            tracked = set(MediaBlob.objects.filter(name__in=[n for _, n in rows]).values_list('name', flat=True))
+            for pk, name in rows:
+                if name in tracked:
+                    continue   # already content-addressed
+                if name in moved:
+                    new_name = moved[name]
+                    if not options['dry_run']:
+                        # another reference to a file this run already moved
+                        MediaBlob.objects.filter(name=new_name).update(refcount=F('refcount') + 1)
+                elif not legacy.exists(name):
+                    missing += 1
+                    continue
+                elif options['dry_run']:
+                    new_name = moved[name] = name
+                else:
+                    with legacy.open(name, 'rb') as f:
+                        # saving under the old name keeps the upload_to prefix
+                        new_name = moved[name] = default_storage.save(name, f)
+                count += 1
+                if not options['dry_run']:
+                    model.objects.filter(pk=pk).update(**{field: new_name}, updated_at=timezone.now())
+
+        verb = "would move" if options['dry_run'] else "moved"
+        self.stdout.write(f"{model.__name__}.{field}: {verb} {count} file(s), {missing} missing on disk")
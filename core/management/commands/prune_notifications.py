@@ -0,0 +1,39 @@
+import contextlib
+
+from django.core.management.base import BaseCommand
+
+from core import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete read notifications older than --max-age-days and trim every user to their newest "
+        "--keep notifications, in small primary-key chunks. Optionally append deleted rows to a "
+        "JSON-lines archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=retention.RETENTION_DAYS,
+                            help="Read notifications older than this are deleted (0 to skip)")
+        parser.add_argument('--keep', type=int, default=retention.MAX_PER_USER,
+                            help="Notifications kept per user (0 to skip)")
+        parser.add_argument('--chunk-size', type=int, default=retention.CHUNK_SIZE)
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help="Seconds to pause between chunks so other writers get the lock")
+        parser.add_argument('--archive', help="Append deleted rows to this .jsonl file")
+
+    def handle(self, *args, **options):
+        with contextlib.ExitStack() as stack:
+            archive = None
+            if options['archive']:
+                archive = stack.enter_context(open(options['archive'], 'a', encoding='utf-8'))
+            result = retention.prune(
+                max_age_days=options['max_age_days'],
+                keep=options['keep'],
+                chunk_size=options['chunk_size'],
+                archive=archive,
+                sleep=options['sleep'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['expired']} expired and {result['trimmed']} over-cap notification(s)."
+        ))
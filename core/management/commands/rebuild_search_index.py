@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Repopulate the SQLite full-text search tables from Profile and Post (e.g. after a bulk import)."
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError("Full-text search tables only exist on SQLite; other databases use icontains lookups.")
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the search index."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.models import FollowersCount
+from core import timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home timelines from the follow table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help="Only rebuild these users (default: everyone who follows someone)")
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if not usernames:
+            usernames = FollowersCount.objects.values_list('follower', flat=True).distinct().order_by('follower')
+
+        count = 0
+        for username in usernames:
+            timeline.rebuild_for(username)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} timeline(s)."))
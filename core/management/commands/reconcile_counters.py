@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import counters
+from core.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Profile.followers_count / following_count / posts_count and Post.comments_count "
+        "from the source tables, one primary-key chunk per transaction with grouped COUNT queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help="Seconds to pause between chunks so other writers get the lock")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        fixed = last_pk = 0
+        while True:
+            profiles = list(Profile.objects.select_related('user')
+                            .filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+            if not profiles:
+                break
+            last_pk = profiles[-1].pk
+            with transaction.atomic():
+                fixed += counters.reconcile_profiles(profiles)
+            time.sleep(options['sleep'])
+        self.stdout.write(f"Corrected counts on {fixed} profile(s).")
+
+        fixed = 0
+        last_pk = None
+        while True:
+            qs = Post.objects.order_by('pk')
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            rows = list(qs.values_list('pk', 'comments_count')[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            with transaction.atomic():
+                fixed += counters.reconcile_posts(rows)
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Corrected comment counts on {fixed} post(s)."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import Post, LikePost
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.no_of_likes from LikePost rows (repairs counts lost with unflushed buffers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = None
+        fixed = 0
+
+        while True:
+            qs = Post.objects.order_by('pk')
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            posts = list(qs.values_list('pk', 'no_of_likes')[:chunk_size])
+            if not posts:
+                break
+            last_pk = posts[-1][0]
+
+            counts = dict(LikePost.objects
+                          .filter(post_id__in=[str(pk) for pk, _ in posts])
+                          .values('post_id')
+                          .annotate(n=Count('id'))
+                          .values_list('post_id', 'n'))
+            with transaction.atomic():
+                for pk, stored in posts:
+                    actual = counts.get(str(pk), 0)
+                    if stored != actual:
+                        Post.objects.filter(pk=pk).update(no_of_likes=actual, updated_at=timezone.now())
+                        fixed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Corrected like counts on {fixed} post(s)."))
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from core import notifications
+from core.models import Notification, NotificationCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's unread notification counter from the Notification table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--user', help="Only reconcile this username")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        last_pk = None
+        fixed = 0
+
+        while True:
+            qs = users if last_pk is None else users.filter(pk__gt=last_pk)
+            rows = list(qs.values_list('pk', 'username')[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            usernames = [u for _, u in rows]
+
+            actual = dict(Notification.objects
+                          .filter(~notifications.read_q(), to_user__in=usernames)
+                          .order_by()
+                          .values('to_user')
+                          .annotate(n=Count('id'))
+                          .values_list('to_user', 'n'))
+            stored = dict(NotificationCounter.objects
+                          .filter(owner__in=usernames)
+                          .values_list('owner', 'unread'))
+            with transaction.atomic():
+                for username in usernames:
+                    count = actual.get(username, 0)
+                    if stored.get(username) != count:
+                        NotificationCounter.objects.update_or_create(owner=username, defaults={'unread': count})
+                        fixed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Corrected unread counters for {fixed} user(s)."))
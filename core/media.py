@@ -0,0 +1,151 @@
+# core/media.py
+"""
+Serving uploaded media.
+
+Replaces django.conf.urls.static for /media/: answers conditional requests
+(ETag / If-None-Match, Last-Modified / If-Modified-Since) with 304, serves
+single byte ranges with 206, and marks content-addressed files (core.storage,
+whose names are their SHA-256) as immutable for a year. Other files get
+MEDIA_CACHE_MAX_AGE seconds (default 1 hour).
+
+With MEDIA_SENDFILE set, the file transfer itself is handed to the front
+server after the conditional checks:
+
+  'x-accel-redirect'  nginx: `X-Accel-Redirect: MEDIA_ACCEL_PREFIX + path`
+                      (default prefix /protected-media/, an `internal`
+                      location aliased to MEDIA_ROOT)
+  'x-sendfile'        Apache mod_xsendfile / lighttpd: `X-Sendfile: <full path>`
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60)
+SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)
+ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_ADDRESSED = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag(path, st):
+    match = CONTENT_ADDRESSED.search(path)
+    if match:
+        return f'"{match.group(1)}"'   # the name is the content hash
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _byte_range(request, etag, mtime, size):
+    """(start, end) inclusive for a satisfiable single range, 'unsatisfiable', or None for the whole file."""
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        return None   # the client's copy is stale: send it all
+    match = RANGE.match(header.strip())
+    if not match:
+        return None   # multiple or malformed ranges: ignoring Range is allowed
+    first, last = match.groups()
+    if first == '':
+        if last == '' or int(last) == 0:
+            return 'unsatisfiable'
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return 'unsatisfiable'
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+
+    etag = _etag(path, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': (f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+                          if CONTENT_ADDRESSED.search(path) else f'public, max-age={CACHE_MAX_AGE}'),
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if SENDFILE:
+        # the front server streams the file (and handles Range itself)
+        response = HttpResponse(content_type=content_type)
+        if SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = ACCEL_PREFIX.rstrip('/') + '/' + path.lstrip('/')
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        byte_range = _byte_range(request, etag, st.st_mtime, st.st_size)
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+            response['Content-Length'] = st.st_size
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            body = _read_range(full_path, start, length) if request.method != 'HEAD' else []
+            response = StreamingHttpResponse(body, status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+            response['Content-Length'] = length
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,76 @@
+# Generated by Django 3.2.6 on 2026-10-17 21:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+CHUNK_SIZE = 500
+
+
+def fill_timelines(apps, schema_editor):
+    """
+    Materialize existing follows, like core.timeline.backfill_follow: the most
+    recent TIMELINE_BACKFILL_LIMIT posts of each followee, skipping authors
+    served by the pull path. Walks the follow table in primary-key chunks.
+    """
+    FollowersCount = apps.get_model('core', 'FollowersCount')
+    Post = apps.get_model('core', 'Post')
+    TimelineEntry = apps.get_model('core', 'TimelineEntry')
+    threshold = getattr(settings, 'TIMELINE_FANOUT_THRESHOLD', 5000)
+    limit = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 200)
+
+    pulled = set(FollowersCount.objects.order_by().values('user')
+                 .annotate(n=Count('id')).filter(n__gte=threshold)
+                 .values_list('user', flat=True))
+    recent = {}   # followee -> [(post id, created_at)]
+    last_pk = 0
+    while True:
+        follows = list(FollowersCount.objects.filter(pk__gt=last_pk).order_by('pk')
+                       .values_list('pk', 'follower', 'user')[:CHUNK_SIZE])
+        if not follows:
+            break
+        last_pk = follows[-1][0]
+        entries = []
+        for _, follower, user in follows:
+            if user in pulled:
+                continue
+            if user not in recent:
+                recent[user] = list(Post.objects.filter(user=user).order_by('-created_at')
+                                    .values_list('id', 'created_at')[:limit])
+            entries.extend(TimelineEntry(owner=follower, post_id=post_id, author=user, created_at=created_at)
+                           for post_id, created_at in recent[user])
+        TimelineEntry.objects.bulk_create(entries, batch_size=CHUNK_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=150)),
+                ('author', models.CharField(max_length=150)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='core.post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', '-created_at'], name='core_tl_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', 'author'], name='core_tl_owner_author_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('owner', 'post')},
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.6 on 2026-10-17 21:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=150)),
+                ('score', models.FloatField()),
+                ('mutual_count', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.profile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='suggestion',
+            index=models.Index(fields=['owner', '-score'], name='core_sugg_owner_score_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='suggestion',
+            unique_together={('owner', 'candidate')},
+        ),
+    ]
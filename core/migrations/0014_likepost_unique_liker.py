@@ -0,0 +1,32 @@
+# Generated by Django 3.2.6 on 2026-10-17 21:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    # keep the oldest row of each (post_id, username) pair so the constraint can be added
+    LikePost = apps.get_model('core', 'LikePost')
+    dupes = (LikePost.objects.values('post_id', 'username')
+             .annotate(n=Count('id'), keep=Min('id'))
+             .filter(n__gt=1))
+    for row in dupes:
+        (LikePost.objects
+         .filter(post_id=row['post_id'], username=row['username'])
+         .exclude(id=row['keep'])
+         .delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_legacy_fk_refs'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likepost',
+            constraint=models.UniqueConstraint(fields=('post_id', 'username'), name='core_likepost_unique_liker'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-17 22:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_notification_aggregation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='read_through',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.6 on 2026-10-17 22:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_notification_read_through'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_thumb',
+            field=models.ImageField(blank=True, upload_to='post_images/thumbs'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_webp',
+            field=models.ImageField(blank=True, upload_to='post_images/webp'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profileimg_thumb',
+            field=models.ImageField(blank=True, upload_to='profile_images/thumbs'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profileimg_webp',
+            field=models.ImageField(blank=True, upload_to='profile_images/webp'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# SQLite FTS5 tables behind core/search.py. `username` is stored in both so
+# results can be filtered (blocked users) without a join.
+CREATE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS core_profile_fts USING fts5(
+        profile_id UNINDEXED, username, bio, location,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS core_post_fts USING fts5(
+        post_id UNINDEXED, username, caption,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """INSERT INTO core_profile_fts (profile_id, username, bio, location)
+       SELECT p.id, u.username, p.bio, p.location
+       FROM core_profile p JOIN auth_user u ON u.id = p.user_id""",
+    """INSERT INTO core_post_fts (post_id, username, caption)
+       SELECT id, user, caption FROM core_post""",
+]
+DROP = [
+    "DROP TABLE IF EXISTS core_profile_fts",
+    "DROP TABLE IF EXISTS core_post_fts",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # other databases fall back to icontains lookups in core/search.py
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_uploadsession'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.6 on 2026-10-17 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'timestamp', 'id'], name='core_comment_post_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 3.2.6 on 2026-10-17 22:16
+
+from django.db import migrations, models
+from django.db.models import Count
+
+CHUNK_SIZE = 500
+
+
+def _grouped(queryset, field, distinct=None):
+    # same grouped counts as core.counters (which uses the live models)
+    rows = (queryset.order_by().values(field)
+            .annotate(n=Count(distinct or 'pk', distinct=bool(distinct)))
+            .values_list(field, 'n'))
+    return dict(rows)
+
+
+def fill_counts(apps, schema_editor):
+    Profile = apps.get_model('core', 'Profile')
+    Post = apps.get_model('core', 'Post')
+    Comment = apps.get_model('core', 'Comment')
+    FollowersCount = apps.get_model('core', 'FollowersCount')
+
+    last_pk = 0
+    while True:
+        profiles = list(Profile.objects.filter(pk__gt=last_pk).order_by('pk')
+                        .values_list('pk', 'user__username')[:CHUNK_SIZE])
+        if not profiles:
+            break
+        last_pk = profiles[-1][0]
+        names = [name for _, name in profiles]
+        followers = _grouped(FollowersCount.objects.filter(user__in=names), 'user', distinct='follower')
+        following = _grouped(FollowersCount.objects.filter(follower__in=names), 'follower', distinct='user')
+        posts = _grouped(Post.objects.filter(user__in=names), 'user')
+        for pk, name in profiles:
+            counts = dict(followers_count=followers.get(name, 0),
+                          following_count=following.get(name, 0),
+                          posts_count=posts.get(name, 0))
+            if any(counts.values()):
+                Profile.objects.filter(pk=pk).update(**counts)
+
+    last_pk = None
+    while True:
+        qs = Post.objects.order_by('pk')
+        if last_pk is not None:
+            qs = qs.filter(pk__gt=last_pk)
+        ids = list(qs.values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            break
+        last_pk = ids[-1]
+        for pk, n in _grouped(Comment.objects.filter(post__in=ids), 'post').items():
+            Post.objects.filter(pk=pk).update(comments_count=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_comment_post_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='posts_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-17 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_comment_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('finalizing', 'Finalizing'), ('complete', 'Complete')], default='open', max_length=10),
+        ),
+    ]
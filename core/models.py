@@ -5,24 +5,129 @@ from datetime import datetime
 
 User = get_user_model()
 
+
+class LegacyRefsMixin:
+    """
+    Keeps the integer foreign keys in step with the legacy username / id string
+    columns while both exist (see `manage.py backfill_fks`).
+
+    On save, an FK that is still empty is resolved from its string column when
+    the row is new or that column changed since it was loaded, so code that
+    only sets usernames keeps working unchanged. Callers that already hold the
+    User / Post should set the FK themselves and skip the lookup; rows whose
+    string never resolved are left to backfill_fks rather than re-queried on
+    every save.
+      username_refs: {fk field: username column}  -> FK to User
+      post_refs:     {fk field: post id column}   -> FK to Post
+    """
+    username_refs = {}
+    post_refs = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_legacy_refs()
+        return instance
+
+    def _remember_legacy_refs(self):
+        # deferred columns aren't in __dict__; reading them would cost a query
+        self._loaded_refs = {column: self.__dict__[column]
+                             for column in (*self.username_refs.values(), *self.post_refs.values())
+                             if column in self.__dict__}
+
+    def _needs_ref(self, fk, column):
+        if getattr(self, fk + '_id') is not None or column not in self.__dict__:
+            return False
+        if self._state.adding:
+            return True
+        loaded = getattr(self, '_loaded_refs', {})
+        return column not in loaded or loaded[column] != self.__dict__[column]
+
+    def sync_legacy_refs(self):
+        for fk, column in self.username_refs.items():
+            username = getattr(self, column)
+            if username and self._needs_ref(fk, column):
+                user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+                setattr(self, fk + '_id', user_id)
+        for fk, column in self.post_refs.items():
+            post_id = getattr(self, column)
+            if post_id and self._needs_ref(fk, column):
+                try:
+                    post_id = uuid.UUID(str(post_id))
+                except ValueError:
+                    continue
+                if Post.objects.filter(id=post_id).exists():
+                    setattr(self, fk + '_id', post_id)
+
+    def save(self, *args, **kwargs):
+        self.sync_legacy_refs()
+        super().save(*args, **kwargs)
+        self._remember_legacy_refs()
+
+
+class CountersMixin:
+    """
+    Leaves the denormalized count columns out of full saves of existing rows.
+
+    Those columns are only changed by `count = count + n` UPDATEs (core.counters,
+    core.likes); writing back the value loaded with the instance would undo
+    increments made since it was read.
+      counter_fields: names of the columns to protect
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
 # Create your models here.
-class Profile(models.Model):
+class Profile(CountersMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     id_user = models.IntegerField()
     bio = models.TextField(blank=True)
     profileimg = models.ImageField(upload_to='profile_images', default='blank-profile-picture.png')
     location = models.CharField(max_length=100, blank=True)
+    # derivatives written by core.images on upload
+    profileimg_thumb = models.ImageField(upload_to='profile_images/thumbs', blank=True)
+    profileimg_webp = models.ImageField(upload_to='profile_images/webp', blank=True)
+    # denormalized counts, maintained by core.counters
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    posts_count = models.IntegerField(default=0)
+    # bumped by every write that changes what the API shows (HTTP validators)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    counter_fields = ('followers_count', 'following_count', 'posts_count')
 
     def __str__(self):
         return self.user.username
 
-class Post(models.Model):
+    @property
+    def avatar_url(self):
+        """Small avatar image (the thumbnail when one has been generated)."""
+        return (self.profileimg_thumb or self.profileimg).url
+
+class Post(CountersMixin, LegacyRefsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     user = models.CharField(max_length=100)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
     image = models.ImageField(upload_to='post_images')
     caption = models.TextField()
     created_at = models.DateTimeField(default=datetime.now)
     no_of_likes = models.IntegerField(default=0)
+    # original dimensions and derivatives, written by core.images on upload
+    image_width = models.IntegerField(null=True, blank=True)
+    image_height = models.IntegerField(null=True, blank=True)
+    image_thumb = models.ImageField(upload_to='post_images/thumbs', blank=True)
+    image_webp = models.ImageField(upload_to='post_images/webp', blank=True)
+    comments_count = models.IntegerField(default=0)   # maintained by core.counters
+    updated_at = models.DateTimeField(auto_now=True)  # also set by counter / like updates
+
+    username_refs = {'author': 'user'}
+    counter_fields = ('no_of_likes', 'comments_count')
 
     def __str__(self):
         return self.user
@@ -34,16 +139,30 @@ class Post(models.Model):
         except:
             return None
 
-class LikePost(models.Model):
+class LikePost(LegacyRefsMixin, models.Model):
     post_id = models.CharField(max_length=500)
     username = models.CharField(max_length=100)
+    liked_post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='likes')
+    liker = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='likes')
+
+    username_refs = {'liker': 'username'}
+    post_refs = {'liked_post': 'post_id'}
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post_id', 'username'], name='core_likepost_unique_liker'),
+        ]
 
     def __str__(self):
         return self.username
 
-class FollowersCount(models.Model):
+class FollowersCount(LegacyRefsMixin, models.Model):
     follower = models.CharField(max_length=100)
     user = models.CharField(max_length=100)
+    follower_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='following_rows')
+    followed_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='follower_rows')
+
+    username_refs = {'follower_user': 'follower', 'followed_user': 'user'}
 
     def __str__(self):
         return self.user
@@ -51,7 +170,7 @@ class FollowersCount(models.Model):
 
 # core/models.py (Notification model excerpt)
 
-class Notification(models.Model):
+class Notification(LegacyRefsMixin, models.Model):
     NOTIF_TYPES = (
         ('like', 'Like'),
         ('follow', 'Follow'),
@@ -67,30 +186,59 @@ class Notification(models.Model):
     post_id = models.CharField(max_length=200, blank=True, null=True)
     url = models.CharField(max_length=500, blank=True)
     read = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True)   # bumped when another actor is merged in
+    # aggregation (core.notifications): `actor` is the latest actor, `actor_count`
+    # how many distinct actors the row stands for, `recent_actors` the newest few
+    actor_count = models.IntegerField(default=1)
+    recent_actors = models.JSONField(default=list, blank=True)
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    actor_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+
+    username_refs = {'recipient': 'to_user', 'actor_user': 'actor'}
 
     class Meta:
         ordering = ('-timestamp',)
+        indexes = [
+            models.Index(fields=['to_user', '-timestamp'], name='core_notif_to_user_ts_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.actor} {self.verb} → {self.to_user}"
+        return f"{self.summary} → {self.to_user}"
+
+    @property
+    def summary(self):
+        """'alice liked your post', 'alice and bob ...', 'alice and 212 others ...'"""
+        if self.actor_count <= 1:
+            return f"{self.actor} {self.verb}"
+        if self.actor_count == 2 and len(self.recent_actors) > 1:
+            return f"{self.actor} and {self.recent_actors[1]} {self.verb}"
+        others = self.actor_count - 1
+        return f"{self.actor} and {others} other{'s' if others != 1 else ''} {self.verb}"
 
 
-class Comment(models.Model):
+class Comment(LegacyRefsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     user = models.CharField(max_length=150)           # username of commenter
     body = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # moves on edits; timestamp doesn't
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='comments')
+
+    username_refs = {'author': 'user'}
 
     class Meta:
         ordering = ('timestamp',)  # oldest first; use '-timestamp' if you prefer newest first
+        indexes = [
+            # latest-N per post and the "load more" cursor walk this backwards
+            models.Index(fields=['post', 'timestamp', 'id'], name='core_comment_post_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} on {self.post.id}: {self.body[:30]}"
     
 
-class Block(models.Model):
+class Block(LegacyRefsMixin, models.Model):
     """
     Records that `blocker` has blocked `blocked`.
     Storing usernames (like your other models) to match your project style.
@@ -98,10 +246,119 @@ class Block(models.Model):
     blocker = models.CharField(max_length=150)   # username who blocks
     blocked = models.CharField(max_length=150)   # username who is blocked
     timestamp = models.DateTimeField(auto_now_add=True)
+    blocker_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='blocks_made')
+    blocked_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='blocks_received')
+
+    username_refs = {'blocker_user': 'blocker', 'blocked_user': 'blocked'}
 
     class Meta:
         unique_together = ('blocker', 'blocked')
         ordering = ('-timestamp',)
 
     def __str__(self):
-        return f"{self.blocker} blocked {self.blocked}"
\ No newline at end of file
+        return f"{self.blocker} blocked {self.blocked}"
+
+class TimelineEntry(models.Model):
+    """
+    One row per (reader, post) in a user's materialized home feed.
+    Written by core.timeline when a post is created or a follow happens,
+    so the feed is a single indexed read instead of one query per followee.
+    Rows go away with the post (CASCADE) and are removed on unfollow/block.
+    """
+    owner = models.CharField(max_length=150)          # username whose home feed this row belongs to
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.CharField(max_length=150)         # post.user, kept here so unfollow/block can delete by author
+    created_at = models.DateTimeField()               # post.created_at, copied so the feed sorts without a join
+
+    class Meta:
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='core_tl_owner_created_idx'),
+            models.Index(fields=['owner', 'author'], name='core_tl_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} <- {self.author}"
+
+
+class Suggestion(models.Model):
+    """
+    Precomputed "users you may follow" entry: `candidate` ranked for `owner`
+    by core.suggestions from second-degree follows. Refreshed in bulk by
+    `manage.py compute_suggestions`.
+    """
+    owner = models.CharField(max_length=150)          # username the suggestion is shown to
+    candidate = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    mutual_count = models.IntegerField(default=0)     # how many people `owner` follows also follow the candidate
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('owner', 'candidate')
+        indexes = [
+            models.Index(fields=['owner', '-score'], name='core_sugg_owner_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate} for {self.owner}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Per-user notification state, kept in step by core.notifications: the
+    unread count (so the badge is a single-row read) and the mark-all-read
+    watermark - every notification with a timestamp at or before
+    `read_through` counts as read, whatever its own `read` flag says.
+    `manage.py reconcile_notification_counts` recomputes `unread` if it drifts.
+    """
+    owner = models.CharField(max_length=150, unique=True)   # username
+    unread = models.IntegerField(default=0)
+    read_through = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.owner}: {self.unread} unread"
+
+
+class MediaBlob(models.Model):
+    """
+    A file in core.storage.ContentAddressedStorage, named by its SHA-256.
+    `refcount` is how many image fields reference it; the file is removed
+    when it drops to zero.
+    """
+    name = models.CharField(max_length=255, unique=True)   # storage path
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} ref)"
+
+
+class UploadSession(models.Model):
+    """
+    A chunked, resumable image upload (core.uploads). Chunks are appended to a
+    part file on disk; `received` is how many bytes of `size` have arrived.
+    Finalizing checks the SHA-256 and turns the file into a Post.
+    """
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('finalizing', 'Finalizing'),   # claimed by one finalize request
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.CharField(max_length=150)          # username
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.BigIntegerField(default=0)
+    caption = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.owner}: {self.filename} ({self.received}/{self.size})"
@@ -0,0 +1,150 @@
+# core/notification_queue.py
+"""
+Background notification writer.
+
+create_notification only puts an event on an in-process queue; a daemon
+worker drains it and writes up to BATCH_SIZE events at a time through
+notifications.write_batch (one bulk INSERT plus one UPDATE per aggregated
+row), then pushes the results to open notification streams. The like / follow
+/ comment request no longer waits on the notification write.
+
+Settings:
+  NOTIFICATION_QUEUE_MODE      'async' (default) or 'sync' - sync writes in the
+                               caller, which is what tests and management
+                               commands usually want
+  NOTIFICATION_QUEUE_SIZE      bound on queued events (default 10000). When the
+                               queue is full the caller writes its own event
+                               synchronously, so a slow database pushes back on
+                               requests instead of growing memory or dropping work
+  NOTIFICATION_BATCH_SIZE      events per write (default 200)
+  NOTIFICATION_FLUSH_INTERVAL  seconds the worker waits to fill a batch (default 0.2)
+
+Queued events are lost if the process is killed; an atexit hook drains the
+queue on normal shutdown. `notification_queue.stats()` reports depth and
+counters (also at GET /api/notifications/queue_stats/ for staff).
+"""
+import atexit
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import notifications, realtime
+from .models import Notification
+
+MODE = getattr(settings, 'NOTIFICATION_QUEUE_MODE', 'async')
+QUEUE_SIZE = getattr(settings, 'NOTIFICATION_QUEUE_SIZE', 10000)
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 200)
+FLUSH_INTERVAL = getattr(settings, 'NOTIFICATION_FLUSH_INTERVAL', 0.2)
+
+
+class NotificationQueue:
+
+    def __init__(self, mode=MODE, maxsize=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats = {
+            'enqueued': 0,        # events accepted onto the queue
+            'written': 0,         # events written by the worker or a flush
+            'batches': 0,
+            'sync_writes': 0,     # events written in the caller (sync mode)
+            'overflow': 0,        # events written in the caller because the queue was full
+            'errors': 0,          # batches that failed to write
+            'max_depth': 0,
+        }
+
+    def enqueue(self, event):
+        if self.mode == 'sync':
+            self._count('sync_writes')
+            self._write([event])
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count('overflow')
+            self._write([event])
+            return
+        with self._lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='notification-writer', daemon=True)
+                self._worker.start()
+
+    def flush(self):
+        """Write everything queued so far in the calling thread."""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, depth=self._queue.qsize(), mode=self.mode)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _drain(self, block):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and not batch:
+                    batch.append(self._queue.get())
+                elif block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            self._write(batch)
+        except Exception:
+            # a failed batch must not kill the worker; like the old synchronous
+            # path, notifications are best-effort
+            self._count('errors')
+        else:
+            self._count('written', len(batch))
+            self._count('batches')
+
+    def _write(self, events):
+        touched = notifications.write_batch(events)
+        _publish(touched)
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            try:
+                self._write_batch(batch)
+            finally:
+                close_old_connections()
+
+
+def _publish(touched):
+    broker = realtime.get_broker()
+    for username in {n.to_user for n in touched}:
+        if not broker.is_listening(username):
+            continue
+        rows = [n for n in touched if n.to_user == username]
+        if any(n.pk is None for n in rows):
+            # bulk_create didn't hand back ids (SQLite); re-read the newest rows
+            rows = list(Notification.objects.filter(to_user=username).order_by('-timestamp')[:len(rows)])
+        for n in reversed(rows):
+            realtime.publish_notification(n)
+
+
+notification_queue = NotificationQueue()
+atexit.register(notification_queue.flush)
@@ -0,0 +1,208 @@
+# core/notifications.py
+"""
+Notification writes: aggregation and unread counts.
+
+Likes, comments and follows on the same target within
+NOTIFICATION_AGGREGATION_WINDOW seconds collapse into one unread row ("alice and
+212 others liked your post") instead of one row per actor. The row keeps the
+latest actor, a distinct-actor count and a small sample of recent actors, and
+its timestamp moves forward so it resurfaces at the top. Once the recipient has
+read it, the next actor starts a fresh row. Writes are batched: write_batch
+handles a list of events with one lookup, one bulk INSERT and one UPDATE per
+merged row (core.notification_queue feeds it from a background worker).
+
+Counting unread rows on every badge refresh is a COUNT(*) over the user's
+notifications, so each user has a NotificationCounter row that is adjusted
+whenever a notification is created or marked read. Every change goes through
+here: create_notification bumps it, mark_read / mark_all_read lower it.
+
+"Mark all read" doesn't touch the notifications: it moves the user's
+read_through watermark to now, so it is one row write however many are unread.
+A notification is read if its own `read` flag is set (marked individually) or
+it is not newer than the watermark; is_read / unread_q / read_q apply that rule.
+
+A user without a counter row (e.g. created before the counter existed) gets one
+seeded from the Notification table on first use. `manage.py
+reconcile_notification_counts` does the same for everyone.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+AGGREGATION_WINDOW = getattr(settings, 'NOTIFICATION_AGGREGATION_WINDOW', 6 * 60 * 60)
+AGGREGATED_TYPES = ('like', 'comment', 'follow')
+RECENT_ACTORS = 3
+
+
+def read_through(username):
+    """The user's mark-all-read watermark, or None."""
+    return NotificationCounter.objects.filter(owner=username).values_list('read_through', flat=True).first()
+
+
+def unread_q(watermark):
+    """Filter for one user's unread notifications, given their watermark."""
+    q = Q(read=False)
+    if watermark is not None:
+        q &= Q(timestamp__gt=watermark)
+    return q
+
+
+def read_q():
+    """Filter for read notifications across all users (each against their own watermark)."""
+    under_watermark = Exists(NotificationCounter.objects.filter(
+        owner=OuterRef('to_user'), read_through__gte=OuterRef('timestamp')))
+    return Q(read=True) | Q(under_watermark)
+
+
+def is_read(notification, watermark):
+    return notification.read or (watermark is not None and notification.timestamp <= watermark)
+
+
+def _count_unread(username):
+    return Notification.objects.filter(unread_q(read_through(username)), to_user=username).count()
+
+
+def reconcile(username):
+    """Recompute `username`'s counter from the Notification table."""
+    count = _count_unread(username)
+    NotificationCounter.objects.update_or_create(owner=username, defaults={'unread': count})
+    return count
+
+
+def unread_count(username):
+    count = NotificationCounter.objects.filter(owner=username).values_list('unread', flat=True).first()
+    if count is None:
+        count = reconcile(username)
+    return count
+
+
+def _adjust(username, delta):
+    updated = (NotificationCounter.objects
+               .filter(owner=username)
+               .update(unread=Greatest(F('unread') + delta, 0)))
+    if not updated:
+        # first change for this user: seed from the table, which already includes it
+        try:
+            with transaction.atomic():
+                reconcile(username)
+        except IntegrityError:
+            # someone else created the row meanwhile; theirs counted our change too
+            pass
+
+
+def create(to_user, actor, verb, notif_type, post_id=None, url=''):
+    """
+    Record that `actor` did `verb` for `to_user`: merged into a recent unread
+    row for the same (type, post) when there is one, otherwise a new row.
+    Returns the notification.
+    """
+    return write_batch([dict(to_user=to_user, actor=actor, verb=verb, notif_type=notif_type,
+                             post_id=post_id, url=url)])[0]
+
+
+def _key(event):
+    return (event['to_user'], event['notif_type'], event['post_id'])
+
+
+def write_batch(events):
+    """
+    Write a list of notification events (dicts of create()'s arguments).
+    Events for the same (recipient, type, post) are folded together first,
+    then into an existing unread row if one is recent enough. Returns the
+    notifications that were created or updated; on backends that don't
+    return ids from bulk inserts (SQLite), new ones have no pk.
+    """
+    def aggregates(event):
+        return AGGREGATION_WINDOW and event['notif_type'] in AGGREGATED_TYPES
+
+    groups = {}    # aggregation key -> notification events are folded into
+    merged = {}    # pk -> existing row that got new actors
+    new_rows = []
+
+    with transaction.atomic():
+        # lock the recipients' counters for the whole write, so a concurrent
+        # mark_all_read lands either before it (and its watermark is used below)
+        # or after it (and zeroes what we add)
+        watermarks = dict(NotificationCounter.objects.select_for_update()
+                          .filter(owner__in={e['to_user'] for e in events})
+                          .values_list('owner', 'read_through'))
+        keys = {_key(e) for e in events if aggregates(e)}
+        if keys:
+            wanted = Q()
+            for to_user, notif_type, post_id in keys:
+                wanted |= Q(to_user=to_user, notif_type=notif_type, post_id=post_id)
+            since = timezone.now() - timedelta(seconds=AGGREGATION_WINDOW)
+            for n in (Notification.objects.select_for_update()
+                      .filter(wanted, read=False, timestamp__gte=since)
+                      .order_by('timestamp')):
+                if is_read(n, watermarks.get(n.to_user)):
+                    continue   # already read via mark-all-read; merging would resurface it
+                groups[(n.to_user, n.notif_type, n.post_id)] = n   # newest wins
+
+        for event in events:
+            n = groups.get(_key(event)) if aggregates(event) else None
+            if n is None:
+                n = Notification(recent_actors=[event['actor']], **event)
+                new_rows.append(n)
+                if aggregates(event):
+                    groups[_key(event)] = n
+            else:
+                _fold(n, event['actor'])
+                if n.pk is not None:
+                    merged[n.pk] = n
+
+        for n in merged.values():
+            Notification.objects.filter(pk=n.pk).update(
+                actor=n.actor, recent_actors=n.recent_actors,
+                timestamp=n.timestamp, actor_count=n.actor_count,
+            )
+        if new_rows:
+            # fill the user FKs with one lookup instead of save()'s per-row sync
+            user_ids = dict(User.objects
+                            .filter(username__in={n.to_user for n in new_rows} | {n.actor for n in new_rows})
+                            .values_list('username', 'id'))
+            for n in new_rows:
+                n.recipient_id = user_ids.get(n.to_user)
+                n.actor_user_id = user_ids.get(n.actor)
+            Notification.objects.bulk_create(new_rows)
+
+        # in the same transaction as the rows, counting only what the watermark leaves unread
+        unread = Counter(n.to_user for n in new_rows if not is_read(n, watermarks.get(n.to_user)))
+        for username, count in unread.items():
+            _adjust(username, count)
+    return list(merged.values()) + new_rows
+
+
+def _fold(n, actor):
+    recent = n.recent_actors or [n.actor]
+    # an actor already in the sample (e.g. like, unlike, like again) isn't counted twice
+    if actor not in recent and actor != n.actor:
+        n.actor_count += 1
+    n.recent_actors = ([actor] + [a for a in recent if a != actor])[:RECENT_ACTORS]
+    n.actor = actor
+    n.timestamp = timezone.now()
+
+
+def mark_read(notification):
+    """Mark one notification read; returns True if it was unread."""
+    changed = (Notification.objects
+               .filter(unread_q(read_through(notification.to_user)), id=notification.id)
+               .update(read=True))
+    notification.read = True
+    if changed:
+        _adjust(notification.to_user, -1)
+    return bool(changed)
+
+
+def mark_all_read(username):
+    """Everything up to now is read: one write to the user's counter row."""
+    NotificationCounter.objects.update_or_create(
+        owner=username, defaults={'unread': 0, 'read_through': timezone.now()})
@@ -0,0 +1,53 @@
+# core/pagination.py
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, url-safe encoding of the (created_at, id) of the last row
+a client has seen. Filtering on that pair instead of using OFFSET keeps every
+page an index range scan and stays stable while new rows are inserted.
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULT_LIMIT = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+MAX_LIMIT = 100
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return (created_at, pk) for a cursor string, or None for an empty cursor.
+    Raises ValueError for anything that isn't a cursor we produced.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), pk
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Page size from a query param, clamped to [1, maximum]. Raises ValueError on junk."""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), maximum))
+
+
+def keyset_q(key, direction, ts_field='created_at', id_field='id'):
+    """
+    Q object selecting rows strictly before (direction='lt') or after
+    (direction='gt') `key` in (ts_field, id_field) order.
+    """
+    created_at, pk = key
+    return (Q(**{f'{ts_field}__{direction}': created_at}) |
+            Q(**{ts_field: created_at, f'{id_field}__{direction}': pk}))
@@ -0,0 +1,104 @@
+# core/post_cards.py
+"""
+Versioned fragment cache for rendered post cards.
+
+The `{% postcard %}` block tag (core/templatetags/post_cards.py) stores the
+HTML of one post card under a key built from the post id and a per-post version
+number kept in the cache. Anything that changes what a card shows bumps the
+version - a like count write (core.likes), a comment added or deleted, the
+post being edited or deleted (core/signals.py) - so old fragments are simply
+never looked up again and expire on their own.
+
+What differs between viewers is part of the key rather than the version: which
+comments are shown (block filtering) and whether the delete control is
+visible. So is the like count the card shows, which includes likes still
+buffered in core.likes before their flush bumps the version. The CSRF token is rendered as a placeholder and substituted on every
+request, so a cached card never carries another session's token.
+
+Versions live in the default cache. If one is evicted it restarts from the
+current time in milliseconds instead of 1, so it can't collide with a version
+that still has fragments cached. Hit/miss counters are per process.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+TIMEOUT = getattr(settings, 'POST_CARD_CACHE_TIMEOUT', 300)
+# what {% csrf_token %} renders inside a cached card; replaced per request
+CSRF_PLACEHOLDER = 'CSRFTOKENPLACEHOLDERc4a1'
+
+
+def _version_key(post_id):
+    return f'postcard:v:{post_id}'
+
+
+def _fresh_version():
+    return int(time.time() * 1000)
+
+
+def version(post_id):
+    key = _version_key(post_id)
+    v = cache.get(key)
+    if v is None:
+        cache.add(key, _fresh_version(), None)
+        v = cache.get(key)
+    return v
+
+
+def bump(post_id):
+    """Invalidate every cached card for `post_id`."""
+    key = _version_key(post_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
+    _count('bumps')
+
+
+def fragment_key(variant, post, viewer_can_delete, like_count):
+    comments = getattr(post, 'latest_comments', ())
+    shown = ','.join(str(c.pk) for c in comments)
+    digest = hashlib.md5(f'{shown}|{getattr(post, "older_comment_count", 0)}'.encode()).hexdigest()[:12]
+    return f'postcard:{variant}:{post.pk}:{version(post.pk)}:{int(viewer_can_delete)}:{like_count}:{digest}'
+
+
+def cached_card(variant, post, viewer_can_delete, like_count, render, csrf_token):
+    """
+    HTML for one card: from the cache if this version was rendered before,
+    otherwise `render()` (called with the CSRF placeholder in place) and stored.
+    """
+    key = fragment_key(variant, post, viewer_can_delete, like_count)
+    html = cache.get(key)
+    if html is None:
+        _count('misses')
+        html = render()
+        cache.set(key, html, TIMEOUT)
+    else:
+        _count('hits')
+    return html.replace(CSRF_PLACEHOLDER, str(csrf_token or ''))
+
+
+# --- counters ----------------------------------------------------------------
+
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def stats():
+    with _lock:
+        hits, misses = _stats['hits'], _stats['misses']
+        return {
+            'hits': hits,
+            'misses': misses,
+            'bumps': _stats['bumps'],
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
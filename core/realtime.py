@@ -0,0 +1,301 @@
+# core/realtime.py
+"""
+Server-sent events for notifications.
+
+`notification_stream` is a small ASGI app mounted by social_book/asgi.py at
+/api/notifications/stream/. It authenticates from the session cookie, sends the
+current unread count, then pushes an event whenever a notification is created
+for the user, with a comment line every HEARTBEAT seconds to keep proxies from
+closing the connection.
+
+Events come from a broker chosen by settings.NOTIFICATION_BROKER:
+
+  core.realtime.LocalBroker     in-process fan-out; create_notification publishes
+                                straight to the open streams. Fine for a single
+                                worker and for tests.
+  core.realtime.DatabaseBroker  each stream polls the user's Notification rows
+                                (new ones, and aggregated ones whose timestamp
+                                moved) and their NotificationCounter row (unread
+                                count changes from mark read / mark all read), so
+                                it works when the writer and the stream live in
+                                different worker processes.
+
+Any class with is_listening(username), publish(username, event) and
+subscribe(username) can be plugged in.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification, NotificationCounter
+from .notifications import unread_count
+
+STREAM_PATH = '/api/notifications/stream/'
+HEARTBEAT = 15
+POLL_INTERVAL = getattr(settings, 'NOTIFICATION_POLL_INTERVAL', 2)
+# how far back each poll looks again for rows whose timestamp was set before
+# their transaction committed; rows already sent are skipped
+POLL_OVERLAP = timedelta(seconds=max(POLL_INTERVAL * 2, 5))
+
+
+def notification_payload(n):
+    return {
+        'id': n.id,
+        'actor': n.actor,
+        'verb': n.verb,
+        'notif_type': n.notif_type,
+        'post_id': n.post_id,
+        'url': n.url,
+        'read': n.read,
+        'actor_count': n.actor_count,
+        'recent_actors': n.recent_actors,
+        'summary': n.summary,
+        'timestamp': n.timestamp.isoformat(),
+    }
+
+
+class LocalBroker:
+    """Fan-out to streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}   # username -> set of LocalSubscription
+
+    def is_listening(self, username):
+        return username in self._subscribers
+
+    def publish(self, username, event):
+        with self._lock:
+            subs = list(self._subscribers.get(username, ()))
+        for sub in subs:
+            sub.push(event)
+
+    def subscribe(self, username):
+        sub = LocalSubscription(self, username)
+        with self._lock:
+            self._subscribers.setdefault(username, set()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.username)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.username]
+
+
+class LocalSubscription:
+    MAX_QUEUED = 100
+
+    def __init__(self, broker, username):
+        self.broker = broker
+        self.username = username
+        self.loop = asyncio.get_running_loop()   # subscribe() is called from the stream coroutine
+        self.queue = asyncio.Queue(maxsize=self.MAX_QUEUED)
+
+    def push(self, event):
+        # publish() runs in a sync worker thread; hand the event to the stream's loop
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass   # slow client: it still gets the next unread count
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class DatabaseBroker:
+    """Streams poll the Notification and NotificationCounter tables; nothing to do on publish."""
+
+    def is_listening(self, username):
+        return False
+
+    def publish(self, username, event):
+        pass
+
+    def subscribe(self, username):
+        return DatabaseSubscription(username)
+
+
+class DatabaseSubscription:
+
+    def __init__(self, username):
+        self.username = username
+        self.last_id = None
+        self.last_seen = None   # newest notification timestamp sent (or the start time)
+        self.sent = {}          # id -> timestamp sent, for rows inside the overlap window
+        self.counter = None     # last (unread, read_through, updated_at) seen
+        self.pending = []
+
+    def _counter_state(self):
+        return (NotificationCounter.objects.filter(owner=self.username)
+                .values_list('unread', 'read_through', 'updated_at').first())
+
+    def _poll(self):
+        qs = Notification.objects.filter(to_user=self.username)
+        if self.last_id is None:
+            self.last_id = qs.order_by('-id').values_list('id', flat=True).first() or 0
+            self.last_seen = timezone.now()
+            # already there when the stream opened: not news
+            self.sent = dict(qs.filter(timestamp__gt=self.last_seen - POLL_OVERLAP).values_list('id', 'timestamp'))
+            self.counter = self._counter_state()
+            return []
+
+        # new rows, and existing rows an aggregated notification moved forward
+        since = self.last_seen - POLL_OVERLAP
+        rows = [n for n in qs.filter(Q(id__gt=self.last_id) | Q(timestamp__gt=since)).order_by('timestamp', 'id')
+                if self.sent.get(n.id) != n.timestamp]
+        for n in rows:
+            self.sent[n.id] = n.timestamp
+            self.last_id = max(self.last_id, n.id)
+            self.last_seen = max(self.last_seen, n.timestamp)
+        self.sent = {pk: ts for pk, ts in self.sent.items() if ts > since}
+
+        counter = self._counter_state()
+        changed, self.counter = counter != self.counter, counter
+        if not rows and not changed:
+            return []
+        count = counter[0] if counter else unread_count(self.username)
+        if rows:
+            # each notification event carries the current count
+            return [{'event': 'notification', 'notification': notification_payload(n), 'unread_count': count}
+                    for n in rows]
+        return [{'event': 'unread', 'unread_count': count}]
+
+    async def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.pending:
+            self.pending = await sync_to_async(self._poll)()
+            if self.pending or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(min(POLL_INTERVAL, max(0, deadline - time.monotonic())))
+        return self.pending.pop(0) if self.pending else None
+
+    def close(self):
+        pass
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'NOTIFICATION_BROKER', 'core.realtime.LocalBroker'))()
+    return _broker
+
+
+def publish_notification(n):
+    """Called by create_notification after a row is written."""
+    if not get_broker().is_listening(n.to_user):
+        return
+    get_broker().publish(n.to_user, {
+        'event': 'notification',
+        'notification': notification_payload(n),
+        'unread_count': unread_count(n.to_user),
+    })
+
+
+def publish_unread_count(username, count=None):
+    """Tell open streams the unread count changed (mark read / mark all read)."""
+    if not get_broker().is_listening(username):
+        return
+    if count is None:
+        count = unread_count(username)
+    get_broker().publish(username, {'event': 'unread', 'unread_count': count})
+
+
+# --- ASGI endpoint -----------------------------------------------------------
+
+def _user_from_cookies(cookie_header):
+    cookies = SimpleCookie()
+    cookies.load(cookie_header)
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    request = SimpleNamespace(session=engine.SessionStore(morsel.value))
+    user = auth.get_user(request)
+    return user if user.is_authenticated else None
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _sse(event):
+    name = event.get('event', 'message')
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def notification_stream(scope, receive, send):
+    headers = {k.decode('latin1').lower(): v.decode('latin1') for k, v in scope.get('headers', [])}
+
+    cors = []
+    origin = headers.get('origin')
+    if origin and origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', []):
+        cors = [(b'access-control-allow-origin', origin.encode()),
+                (b'access-control-allow-credentials', b'true')]
+
+    user = await sync_to_async(_user_from_cookies)(headers.get('cookie', ''))
+    if user is None:
+        await send({'type': 'http.response.start', 'status': 401,
+                    'headers': [(b'content-type', b'application/json')] + cors})
+        await send({'type': 'http.response.body', 'body': b'{"detail": "Authentication credentials were not provided."}'})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ] + cors,
+    })
+
+    username = user.username
+    subscription = get_broker().subscribe(username)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        count = await sync_to_async(unread_count)(username)
+        await send({'type': 'http.response.body', 'body': _sse({'event': 'unread', 'unread_count': count}),
+                    'more_body': True})
+        while True:
+            getter = asyncio.ensure_future(subscription.get(HEARTBEAT))
+            done, _ = await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                getter.cancel()
+                break
+            event = getter.result()
+            body = _sse(event) if event is not None else b": ping\n\n"
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        subscription.close()
+        if not disconnected.done():
+            disconnected.cancel()
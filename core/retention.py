@@ -0,0 +1,114 @@
+# core/retention.py
+"""
+Notification retention.
+
+Two passes, both in small primary-key chunks with a short transaction per
+chunk so SQLite's write lock is never held for long:
+
+  1. read notifications (flagged or under the owner's mark-all-read watermark)
+     older than NOTIFICATION_RETENTION_DAYS are deleted;
+  2. each recipient is trimmed to their newest NOTIFICATION_MAX_PER_USER rows
+     (read or not - unread counters of trimmed users are recomputed).
+
+Deleted rows can be appended to a JSON-lines archive first. Run it with
+`manage.py prune_notifications`, or set NOTIFICATION_PRUNE_INTERVAL (seconds)
+to have each process run it on a daemon thread.
+"""
+import json
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction, close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from . import notifications
+from .models import Notification
+
+RETENTION_DAYS = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+MAX_PER_USER = getattr(settings, 'NOTIFICATION_MAX_PER_USER', 500)
+PRUNE_INTERVAL = getattr(settings, 'NOTIFICATION_PRUNE_INTERVAL', 0)
+CHUNK_SIZE = 500
+
+ARCHIVE_FIELDS = ('id', 'to_user', 'actor', 'verb', 'notif_type', 'post_id', 'url', 'read',
+                  'timestamp', 'actor_count', 'recent_actors')
+
+
+def _delete_chunk(pks, archive):
+    with transaction.atomic():
+        if archive is not None:
+            for row in Notification.objects.filter(pk__in=pks).values(*ARCHIVE_FIELDS):
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        deleted, _ = Notification.objects.filter(pk__in=pks).delete()
+    return deleted
+
+
+def prune_expired(max_age_days=RETENTION_DAYS, chunk_size=CHUNK_SIZE, archive=None, sleep=0):
+    """Delete read notifications older than `max_age_days`. Returns rows deleted."""
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    expired = Notification.objects.filter(notifications.read_q(), timestamp__lt=cutoff).order_by('pk')
+    deleted = 0
+    last_pk = 0
+    while True:
+        pks = list(expired.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        last_pk = pks[-1]
+        deleted += _delete_chunk(pks, archive)
+        time.sleep(sleep)
+
+
+def trim_per_user(keep=MAX_PER_USER, chunk_size=CHUNK_SIZE, archive=None, sleep=0):
+    """Keep only the newest `keep` notifications per recipient. Returns rows deleted."""
+    over = (Notification.objects
+            .order_by()   # keep Meta.ordering out of the GROUP BY
+            .values('to_user')
+            .annotate(n=Count('id'))
+            .filter(n__gt=keep)
+            .values_list('to_user', flat=True))
+    deleted = 0
+    for username in list(over):
+        rows = Notification.objects.filter(to_user=username).order_by('-timestamp', '-id')
+        while True:
+            # everything past the newest `keep` rows, a chunk at a time
+            pks = list(rows.values_list('pk', flat=True)[keep:keep + chunk_size])
+            if not pks:
+                break
+            deleted += _delete_chunk(pks, archive)
+            time.sleep(sleep)
+        notifications.reconcile(username)
+    return deleted
+
+
+def prune(max_age_days=RETENTION_DAYS, keep=MAX_PER_USER, chunk_size=CHUNK_SIZE, archive=None, sleep=0):
+    """Run both passes; returns {'expired': n, 'trimmed': n}."""
+    return {
+        'expired': prune_expired(max_age_days, chunk_size, archive, sleep) if max_age_days else 0,
+        'trimmed': trim_per_user(keep, chunk_size, archive, sleep) if keep else 0,
+    }
+
+
+_pruner = None
+
+
+def start_periodic_pruning(interval=PRUNE_INTERVAL):
+    """Prune every `interval` seconds on a daemon thread (no-op if interval is 0)."""
+    global _pruner
+    if not interval or _pruner is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                prune(sleep=0.05)
+            except Exception:
+                pass   # try again next round
+            finally:
+                close_old_connections()
+
+    _pruner = threading.Thread(target=run, name='notification-pruner', daemon=True)
+    _pruner.start()
@@ -0,0 +1,142 @@
+# core/search.py
+"""
+Full-text search over profiles (username, bio, location) and post captions.
+
+On SQLite the text lives in two FTS5 tables (created by migration 0021) that
+signals keep in step with Profile / Post / User saves and deletes. A search is
+one MATCH query ranked by bm25 - username hits weigh most - plus one query to
+load the matching rows. Every search term is treated as a prefix, so "ali
+trav" finds "alice" with "travel" in her bio.
+
+Other databases have no FTS tables; there the same functions fall back to
+icontains filters. `manage.py rebuild_search_index` repopulates the tables.
+"""
+import re
+import uuid
+
+from django.db import connection
+from django.db.models import Case, Q, When
+
+from .models import Post, Profile
+
+# bm25 column weights: profile_id, username, bio, location / post_id, username, caption
+PROFILE_WEIGHTS = (0.0, 10.0, 2.0, 1.0)
+POST_WEIGHTS = (0.0, 3.0, 1.0)
+MAX_RESULTS = 200
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text):
+    """User input -> FTS5 query: every word as a quoted prefix, all required."""
+    return ' '.join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+def _search(table, key, weights, text, exclude_users, limit, offset):
+    expression = match_expression(text)
+    if not expression:
+        return []
+    sql = [f"SELECT {key} FROM {table} WHERE {table} MATCH %s"]
+    params = [expression]
+    exclude_users = list(exclude_users)
+    if exclude_users:
+        sql.append(f"AND username NOT IN ({', '.join(['%s'] * len(exclude_users))})")
+        params.extend(exclude_users)
+    sql.append(f"ORDER BY bm25({table}, {', '.join(map(str, weights))}) LIMIT %s OFFSET %s")
+    params.extend([limit, offset])
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _in_order(queryset, ids):
+    rows = queryset.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+def profile_ids(text, exclude_users=(), limit=MAX_RESULTS, offset=0):
+    """Ids of matching profiles, best first."""
+    if enabled():
+        return _search('core_profile_fts', 'profile_id', PROFILE_WEIGHTS, text, exclude_users, limit, offset)
+    words = _TOKEN.findall(text)
+    if not words:
+        return []
+    q = Q()
+    for word in words:
+        q &= Q(user__username__icontains=word) | Q(bio__icontains=word) | Q(location__icontains=word)
+    qs = Profile.objects.filter(q).exclude(user__username__in=list(exclude_users)).order_by('id')
+    return list(qs.values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_profiles(text, exclude_users=(), limit=20, offset=0):
+    ids = profile_ids(text, exclude_users, limit, offset)
+    return _in_order(Profile.objects.select_related('user'), ids)
+
+
+def post_ids(text, exclude_users=(), limit=MAX_RESULTS, offset=0):
+    """Ids of posts whose caption (or author's username) matches, best first."""
+    if enabled():
+        ids = _search('core_post_fts', 'post_id', POST_WEIGHTS, text, exclude_users, limit, offset)
+        return [uuid.UUID(pk) for pk in ids]
+    words = _TOKEN.findall(text)
+    if not words:
+        return []
+    q = Q()
+    for word in words:
+        q &= Q(caption__icontains=word) | Q(user__icontains=word)
+    qs = Post.objects.filter(q).exclude(user__in=list(exclude_users)).order_by('-created_at')
+    return list(qs.values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_posts(text, exclude_users=(), limit=20, offset=0):
+    ids = post_ids(text, exclude_users, limit, offset)
+    return _in_order(Post.objects.all(), ids)
+
+
+def ranked(queryset, ids):
+    """`queryset` restricted to `ids` and ordered like them (for paginated viewsets)."""
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(*[When(pk=pk, then=i) for i, pk in enumerate(ids)]))
+
+
+# --- index maintenance (called from core/signals.py) -------------------------
+
+def _execute(sql, params):
+    if enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def index_profile(profile):
+    unindex_profile(profile.pk)
+    _execute("INSERT INTO core_profile_fts (profile_id, username, bio, location) VALUES (%s, %s, %s, %s)",
+             [profile.pk, profile.user.username, profile.bio, profile.location])
+
+
+def unindex_profile(profile_id):
+    _execute("DELETE FROM core_profile_fts WHERE profile_id = %s", [profile_id])
+
+
+def index_post(post):
+    unindex_post(post.pk)
+    _execute("INSERT INTO core_post_fts (post_id, username, caption) VALUES (%s, %s, %s)",
+             [post.pk.hex, post.user, post.caption])
+
+
+def unindex_post(post_id):
+    _execute("DELETE FROM core_post_fts WHERE post_id = %s", [uuid.UUID(str(post_id)).hex])
+
+
+def rebuild():
+    """Repopulate both tables from scratch."""
+    _execute("DELETE FROM core_profile_fts", [])
+    _execute("DELETE FROM core_post_fts", [])
+    _execute("""INSERT INTO core_profile_fts (profile_id, username, bio, location)
+                SELECT p.id, u.username, p.bio, p.location
+                FROM core_profile p JOIN auth_user u ON u.id = p.user_id""", [])
+    _execute("INSERT INTO core_post_fts (post_id, username, caption) SELECT id, user, caption FROM core_post", [])
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Profile, Post, LikePost, FollowersCount, Notification, Comment, Block
+from django.db import models
+from .models import Profile, Post, LikePost, FollowersCount, Notification, Comment, Block, UploadSession
+from . import likes, notifications, images
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -14,11 +16,15 @@ class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
     profileimg_url = serializers.SerializerMethodField()
+    profileimg_thumb_url = serializers.SerializerMethodField()
+    profileimg_webp_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['id', 'user', 'username', 'id_user', 'bio', 'profileimg', 'profileimg_url', 'location']
-        read_only_fields = ['id', 'user', 'id_user']
+        fields = ['id', 'user', 'username', 'id_user', 'bio', 'profileimg', 'profileimg_url',
+                  'profileimg_thumb_url', 'profileimg_webp_url', 'location',
+                  'followers_count', 'following_count', 'posts_count']
+        read_only_fields = ['id', 'user', 'id_user', 'followers_count', 'following_count', 'posts_count']
 
     def get_profileimg_url(self, obj):
         if obj.profileimg:
@@ -28,24 +34,76 @@ class ProfileSerializer(serializers.ModelSerializer):
             return obj.profileimg.url
         return None
 
+    def get_profileimg_thumb_url(self, obj):
+        return images.variant_url(obj, 'profileimg_thumb', self.context.get('request'))
+
+    def get_profileimg_webp_url(self, obj):
+        return images.variant_url(obj, 'profileimg_webp', self.context.get('request'))
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of posts with the per-post lookups (author profile,
+    viewer's like) resolved up front in bulk queries.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.prefetch(posts)
+        return super().to_representation(posts)
+
 
 class PostSerializer(serializers.ModelSerializer):
     user_profile = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    webp_url = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'user_profile', 'image', 'image_url', 'caption', 'created_at', 
+        fields = ['id', 'user', 'user_profile', 'image', 'image_url', 'thumbnail_url', 'webp_url',
+                  'image_width', 'image_height', 'caption', 'created_at',
                   'no_of_likes', 'is_liked', 'comments_count']
-        read_only_fields = ['id', 'created_at', 'no_of_likes']
+        read_only_fields = ['id', 'user', 'created_at', 'no_of_likes', 'image_width', 'image_height',
+                            'comments_count']
+        list_serializer_class = PostListSerializer
+
+    def prefetch(self, posts):
+        """
+        Load author profiles and the viewer's likes for `posts` in two
+        queries; the get_* methods below read from these maps.
+        """
+        self._prefetched_ids = {p.pk for p in posts}
+
+        usernames = {p.user for p in posts}
+        self._profiles = {}
+        for profile in Profile.objects.select_related('user').filter(user__username__in=usernames):
+            # setdefault: keep the first profile, like Post.get_user_profile did
+            self._profiles.setdefault(profile.user.username, profile)
+        self._profile_data = {}
+
+        self._liked = set()
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            self._liked = set(LikePost.objects.filter(
+                username=request.user.username, post_id__in=[str(p.pk) for p in posts]
+            ).values_list('post_id', flat=True))
+
+    def to_representation(self, instance):
+        # single-object use (retrieve/create): resolve the same lookups for just this post
+        if instance.pk not in getattr(self, '_prefetched_ids', ()):
+            self.prefetch([instance])
+        data = super().to_representation(instance)
+        # include likes still buffered in core.likes
+        data['no_of_likes'] = likes.like_count(instance)
+        return data
 
     def get_user_profile(self, obj):
-        profile = obj.get_user_profile()
-        if profile:
-            return ProfileSerializer(profile, context=self.context).data
-        return None
+        if obj.user not in self._profile_data:
+            profile = self._profiles.get(obj.user)
+            self._profile_data[obj.user] = ProfileSerializer(profile, context=self.context).data if profile else None
+        return self._profile_data[obj.user]
 
     def get_image_url(self, obj):
         if obj.image:
@@ -55,14 +113,14 @@ class PostSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return LikePost.objects.filter(post_id=str(obj.id), username=request.user.username).exists()
-        return False
+    def get_thumbnail_url(self, obj):
+        return images.variant_url(obj, 'image_thumb', self.context.get('request'))
 
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+    def get_webp_url(self, obj):
+        return images.variant_url(obj, 'image_webp', self.context.get('request'))
+
+    def get_is_liked(self, obj):
+        return str(obj.pk) in self._liked
 
 
 class LikePostSerializer(serializers.ModelSerializer):
@@ -98,28 +156,63 @@ class FollowersCountSerializer(serializers.ModelSerializer):
             return None
 
 
+class CommentListSerializer(serializers.ListSerializer):
+    """Serializes a page of comments with the commenters' profiles loaded in one query."""
+
+    def to_representation(self, data):
+        comments = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.prefetch(comments)
+        return super().to_representation(comments)
+
+
 class CommentSerializer(serializers.ModelSerializer):
     user_profile = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
         fields = ['id', 'post', 'user', 'user_profile', 'body', 'timestamp']
-        read_only_fields = ['id', 'timestamp']
+        # the commenter is always the requesting user (set in perform_create)
+        read_only_fields = ['id', 'user', 'timestamp']
+        list_serializer_class = CommentListSerializer
+
+    def prefetch(self, comments):
+        """Load the commenters' profiles for `comments` in one query."""
+        self._prefetched_ids = {c.pk for c in comments}
+        self._profiles = {}
+        usernames = {c.user for c in comments}
+        for profile in Profile.objects.select_related('user').filter(user__username__in=usernames):
+            self._profiles.setdefault(profile.user.username, profile)
+        self._profile_data = {}
+
+    def to_representation(self, instance):
+        if instance.pk not in getattr(self, '_prefetched_ids', ()):
+            self.prefetch([instance])
+        return super().to_representation(instance)
 
     def get_user_profile(self, obj):
-        try:
-            user = User.objects.get(username=obj.user)
-            profile = Profile.objects.get(user=user)
-            return ProfileSerializer(profile, context=self.context).data
-        except:
-            return None
+        if obj.user not in self._profile_data:
+            profile = self._profiles.get(obj.user)
+            self._profile_data[obj.user] = ProfileSerializer(profile, context=self.context).data if profile else None
+        return self._profile_data[obj.user]
 
 
 class NotificationSerializer(serializers.ModelSerializer):
+    summary = serializers.CharField(read_only=True)
+    read = serializers.SerializerMethodField()
+
     class Meta:
         model = Notification
-        fields = ['id', 'to_user', 'actor', 'verb', 'notif_type', 'post_id', 'url', 'read', 'timestamp']
-        read_only_fields = ['id', 'timestamp']
+        fields = ['id', 'to_user', 'actor', 'verb', 'notif_type', 'post_id', 'url', 'read', 'timestamp',
+                  'actor_count', 'recent_actors', 'summary']
+        read_only_fields = ['id', 'timestamp', 'actor_count', 'recent_actors']
+
+    def get_read(self, obj):
+        # read individually, or covered by the recipient's mark-all-read watermark;
+        # views pass the watermark in the context, otherwise look it up once per user
+        watermarks = self.context.setdefault('read_through', {})
+        if obj.to_user not in watermarks:
+            watermarks[obj.to_user] = notifications.read_through(obj.to_user)
+        return notifications.is_read(obj, watermarks[obj.to_user])
 
 
 class BlockSerializer(serializers.ModelSerializer):
@@ -147,3 +240,11 @@ class BlockSerializer(serializers.ModelSerializer):
         except:
             return None
 
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'sha256', 'caption', 'offset', 'status', 'post', 'created_at']
+        read_only_fields = ['id', 'status', 'post', 'created_at']
@@ -0,0 +1,101 @@
+# core/signals.py
+"""
+Keeps derived state in step with the models: the search indexes
+(core/search.py, core/typeahead.py), the post card cache versions
+(core/post_cards.py), the post / comment counts (core/counters.py) and
+Profile.updated_at when the nested User fields change.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Comment, Post, Profile
+from . import counters, post_cards, search
+from .typeahead import username_index
+
+
+def _touches(update_fields, *fields):
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+@receiver(post_save, sender=Profile)
+def index_profile(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, 'bio', 'location', 'user'):
+        search.index_profile(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile(sender, instance, **kwargs):
+    search.unindex_profile(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def update_typeahead(sender, instance, **kwargs):
+    # every save: signup creates the profile, image uploads change the avatar
+    username_index.add(instance.user.username, instance.avatar_url)
+
+
+@receiver(post_delete, sender=Profile)
+def remove_from_typeahead(sender, instance, **kwargs):
+    username_index.remove(instance.user.username)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    # like counters and image derivatives save with update_fields; skip those
+    if _touches(update_fields, 'caption', 'user'):
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_username(sender, instance, created=False, update_fields=None, **kwargs):
+    # a new user has no Profile yet; signup saves one right after
+    if not created and _touches(update_fields, 'username'):
+        for profile in Profile.objects.filter(user=instance):
+            profile.user = instance
+            search.index_profile(profile)
+        username_index.invalidate()
+
+
+@receiver(post_save, sender=User)
+def touch_profile(sender, instance, created=False, update_fields=None, **kwargs):
+    # ProfileSerializer nests these User fields; Profile.updated_at is the API's
+    # Last-Modified / ETag input for profiles (login only saves last_login)
+    if not created and _touches(update_fields, 'username', 'email', 'first_name', 'last_name'):
+        Profile.objects.filter(user=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_card(sender, instance, **kwargs):
+    post_cards.bump(instance.pk if sender is Post else instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        counters.post_added(instance.user)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.post_removed(instance.user)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.comment_removed(instance.post_id)
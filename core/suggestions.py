@@ -0,0 +1,96 @@
+# core/suggestions.py
+"""
+"Users you may follow" suggestions from the follow graph.
+
+A candidate is someone followed by the people you follow (friends of friends),
+or someone who follows you that you don't follow back. Candidates are ranked by
+how many of your followees follow them, with a boost if they already follow you.
+
+Ranking walks the in-process follow graph, so it needs no queries; the top-N per
+user is stored in the Suggestion table by `manage.py compute_suggestions` (run
+it periodically), and serving is one indexed read on (owner, score). Nothing is
+ranked while serving: users without stored rows (new since the last run, or
+with no friends-of-friends) are shown the newest profiles.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .graph import follow_graph
+from .models import Profile, Suggestion
+from . import blocks
+
+TOP_N = getattr(settings, 'SUGGESTIONS_TOP_N', 20)
+FOLLOWS_YOU_BOOST = 1.5
+# caps on the walk, so neither someone following everyone nor one followee
+# following everyone makes ranking O(users); over a cap a random sample is
+# walked, which keeps the mutual counts representative
+MAX_FOLLOWEES = 500
+MAX_EXPANSION = 1000
+
+
+def rank_candidates(username, exclude=(), limit=TOP_N):
+    """
+    [(candidate_username, score, mutual_count)] best first, computed from the
+    follow graph. Users already followed, `username` itself and `exclude` are skipped.
+    """
+    following = set(follow_graph.following(username))
+    skip = following | set(exclude) | {username}
+
+    mutual = Counter()
+    for followee in follow_graph.following(username, sample=MAX_FOLLOWEES):
+        for candidate in follow_graph.following(followee, sample=MAX_EXPANSION):
+            if candidate not in skip:
+                mutual[candidate] += 1
+
+    scores = {c: float(n) for c, n in mutual.items()}
+    for follower in follow_graph.followers(username):
+        if follower not in skip:
+            scores[follower] = scores.get(follower, 0.0) + FOLLOWS_YOU_BOOST
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [(c, score, mutual.get(c, 0)) for c, score in ranked]
+
+
+def refresh_for(username):
+    """Recompute and store the top-N suggestions for one user."""
+    ranked = rank_candidates(username, exclude=blocks.blocked_either_way(username))
+    profile_ids = dict(Profile.objects
+                       .filter(user__username__in=[c for c, _, _ in ranked])
+                       .values_list('user__username', 'id'))
+    rows = [
+        Suggestion(owner=username, candidate_id=profile_ids[c], score=score, mutual_count=n)
+        for c, score, n in ranked if c in profile_ids
+    ]
+    with transaction.atomic():
+        Suggestion.objects.filter(owner=username).delete()
+        Suggestion.objects.bulk_create(rows)
+    return len(rows)
+
+
+def get_suggestions(username, exclude=(), limit=4):
+    """
+    Profiles to suggest to `username`. Reads the precomputed rows; users
+    without any (not computed yet, or nothing to suggest) get the newest
+    profiles.
+    `exclude` is extra usernames to hide (e.g. blocked users).
+    """
+    exclude = set(exclude) | {username}
+    # over-fetch a little: rows can go stale between refreshes (new follows/blocks)
+    rows = (Suggestion.objects
+            .filter(owner=username)
+            .select_related('candidate__user')
+            .order_by('-score')[:limit * 3])
+    profiles = [
+        s.candidate for s in rows
+        if s.candidate.user.username not in exclude
+        and not follow_graph.is_following(username, s.candidate.user.username)
+    ]
+    if profiles:
+        return profiles[:limit]
+
+    skip = exclude | set(follow_graph.following(username))
+    return list(Profile.objects.select_related('user')
+                .exclude(user__username__in=skip)
+                .order_by('-id')[:limit])
@@ -0,0 +1,49 @@
+# core/templatetags/post_cards.py
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import likes, post_cards
+
+register = template.Library()
+
+
+class PostCardNode(template.Node):
+
+    def __init__(self, nodelist, variant, post):
+        self.nodelist = nodelist
+        self.variant = variant
+        self.post = post
+
+    def render(self, context):
+        variant = self.variant.resolve(context)
+        post = self.post.resolve(context)
+        user = getattr(context.get('request'), 'user', None)
+        can_delete = bool(user and (user.username == post.user or user.is_superuser))
+
+        def render():
+            with context.push(csrf_token=post_cards.CSRF_PLACEHOLDER):
+                return self.nodelist.render(context)
+
+        return mark_safe(post_cards.cached_card(variant, post, can_delete, likes.like_count(post),
+                                                render, context.get('csrf_token')))
+
+
+@register.filter
+def like_count(post):
+    """The post's like count including likes not yet flushed (core.likes), as the API returns it."""
+    return likes.like_count(post)
+
+
+@register.tag
+def postcard(parser, token):
+    """
+    Cache one rendered post card until the post changes (see core/post_cards.py).
+    Usage: {% postcard "feed" post %} ... {% endpostcard %}
+    The name keeps differently laid-out cards for the same post apart.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a card name and a post")
+    nodelist = parser.parse(('endpostcard',))
+    parser.delete_first_token()
+    return PostCardNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
@@ -1,3 +1,928 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.http import Http404
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .comments import comment_page, older_comments
+from .api_views import CommentViewSet, PostViewSet, ProfileViewSet
+from .models import (Comment, FollowersCount, LikePost, MediaBlob, Notification, NotificationCounter, Post,
+                     Profile, TimelineEntry, UploadSession)
+from .notification_queue import NotificationQueue
+from .pagination import decode_cursor, encode_cursor
+from . import counters, follows, images, likes, media, notifications, search, suggestions, timeline, typeahead, uploads
+from .graph import FollowGraph
+
+
+def walk(post, newest_first=True, exclude_users=(), limit=3):
+    """Follow next cursors through every page; returns (pages, has_more flags)."""
+    pages, flags, cursor = [], [], None
+    while True:
+        rows, has_more = comment_page(post.id, cursor, newest_first=newest_first,
+                                      exclude_users=exclude_users, limit=limit)
+        pages.append(rows)
+        flags.append(has_more)
+        if not has_more:
+            return pages, flags
+        # round-trip through the string form clients send back
+        cursor = decode_cursor(encode_cursor(rows[-1].timestamp, rows[-1].id))
+
+
+class CommentPageTests(TestCase):
+
+    def setUp(self):
+        self.post = Post.objects.create(user='alice', caption='hello', image='x.jpg')
+        self.start = timezone.now() - timedelta(hours=1)
+
+    def comment(self, user, seconds, body=''):
+        c = Comment.objects.create(post=self.post, user=user, body=body or f'{user} {seconds}')
+        # timestamp is auto_now_add; move it to a known place
+        Comment.objects.filter(pk=c.pk).update(timestamp=self.start + timedelta(seconds=seconds))
+        return Comment.objects.get(pk=c.pk)
+
+    def expected(self, comments, newest_first=True):
+        return [c.pk for c in sorted(comments, key=lambda c: (c.timestamp, c.id), reverse=newest_first)]
+
+    def test_newest_first(self):
+        comments = [self.comment('bob', s) for s in range(7)]
+        pages, flags = walk(self.post, limit=3)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertEqual(flags, [True, True, False])
+        self.assertEqual([c.pk for p in pages for c in p], self.expected(comments))
+
+    def test_oldest_first(self):
+        comments = [self.comment('bob', s) for s in range(7)]
+        pages, flags = walk(self.post, newest_first=False, limit=3)
+        self.assertEqual(flags, [True, True, False])
+        self.assertEqual([c.pk for p in pages for c in p], self.expected(comments, newest_first=False))
+
+    def test_has_more_boundary(self):
+        for s in range(3):
+            self.comment('bob', s)
+        rows, has_more = comment_page(self.post.id, limit=3)
+        self.assertEqual(len(rows), 3)
+        self.assertFalse(has_more)
+
+        self.comment('bob', 3)
+        rows, has_more = comment_page(self.post.id, limit=3)
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(has_more)
+        rows, has_more = comment_page(self.post.id, (rows[-1].timestamp, rows[-1].id), limit=3)
+        self.assertEqual(len(rows), 1)
+        self.assertFalse(has_more)
+
+    def test_empty_post(self):
+        self.assertEqual(comment_page(self.post.id), ([], False))
+
+    def test_blocked_commenters_excluded(self):
+        kept = [self.comment('bob', s) for s in range(0, 8, 2)]
+        for s in range(1, 8, 2):
+            self.comment('troll', s)
+        for newest_first in (True, False):
+            pages, _ = walk(self.post, newest_first=newest_first, exclude_users={'troll'}, limit=2)
+            self.assertEqual([c.pk for p in pages for c in p], self.expected(kept, newest_first))
+
+    def test_ties_on_timestamp_broken_by_id(self):
+        # several comments in the same instant must neither repeat nor go missing across pages
+        comments = [self.comment('bob', 10) for _ in range(5)]
+        comments += [self.comment('carol', 5), self.comment('carol', 20)]
+        for newest_first in (True, False):
+            pages, _ = walk(self.post, newest_first=newest_first, limit=2)
+            seen = [c.pk for p in pages for c in p]
+            self.assertEqual(seen, self.expected(comments, newest_first))
+            self.assertEqual(len(set(seen)), len(comments))
+
+    def test_other_posts_ignored(self):
+        other = Post.objects.create(user='alice', caption='other', image='y.jpg')
+        Comment.objects.create(post=other, user='bob', body='elsewhere')
+        mine = self.comment('bob', 1)
+        rows, has_more = comment_page(self.post.id)
+        self.assertEqual([c.pk for c in rows], [mine.pk])
+        self.assertFalse(has_more)
+
+    def test_older_comments_are_returned_oldest_first(self):
+        comments = [self.comment('bob', s) for s in range(6)]
+        newest = comments[-1]
+        rows, has_more = older_comments(self.post.id, (newest.timestamp, newest.id), limit=3)
+        self.assertEqual([c.pk for c in rows], [c.pk for c in comments[2:5]])
+        self.assertTrue(has_more)
+
+
+class HomeFeedPageTests(TestCase):
+
+    def setUp(self):
+        start = timezone.now() - timedelta(hours=1)
+        FollowersCount.objects.create(follower='viewer', user='alice')
+        self.posts = []
+        for i in range(7):
+            post = Post.objects.create(user='alice', caption=f'post {i}', image='x.jpg')
+            # pairs share a created_at so the id tie-break is exercised
+            created_at = start + timedelta(minutes=i // 2)
+            Post.objects.filter(pk=post.pk).update(created_at=created_at)
+            TimelineEntry.objects.create(owner='viewer', post=post, author='alice', created_at=created_at)
+            self.posts.append(Post.objects.get(pk=post.pk))
+        self.newest_first = [p.pk for p in sorted(self.posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+
+    def test_pages_backwards_with_cursor(self):
+        seen, before, flags = [], None, []
+        while True:
+            posts, has_more = timeline.home_feed_page('viewer', limit=3, before=before)
+            seen += [p.pk for p in posts]
+            flags.append(has_more)
+            if not has_more:
+                break
+            before = (posts[-1].created_at, str(posts[-1].pk))
+        self.assertEqual(flags, [True, True, False])
+        self.assertEqual(seen, self.newest_first)
+
+    def test_since_returns_the_posts_just_above_the_cursor(self):
+        oldest = Post.objects.get(pk=self.newest_first[-1])
+        posts, has_more = timeline.home_feed_page('viewer', limit=2, after=(oldest.created_at, str(oldest.pk)))
+        # newest first within the page, and the two immediately newer than the cursor
+        self.assertEqual([p.pk for p in posts], self.newest_first[-3:-1])
+        self.assertTrue(has_more)
+
+    def test_blocked_authors_excluded(self):
+        posts, has_more = timeline.home_feed_page('viewer', exclude_authors={'alice'})
+        self.assertEqual((posts, has_more), ([], False))
+
+
+@mock.patch('core.likes.threading.Thread')   # tests flush by hand
+class LikeCounterTests(TestCase):
+
+    def setUp(self):
+        self.post = Post.objects.create(user='alice', caption='hello', image='x.jpg')
+        self.counter = likes.LikeCounter(flush_interval=60)
+        patcher = mock.patch.object(likes, 'like_counter', self.counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored(self):
+        return Post.objects.get(pk=self.post.pk).no_of_likes
+
+    def test_like_with_objects_at_hand_skips_lookups(self, _thread):
+        bob = User.objects.create_user('bob')
+        with CaptureQueriesContext(connection) as queries:
+            likes.like(self.post, 'bob', user=bob)
+        self.assertEqual([q['sql'] for q in queries if q['sql'].startswith('SELECT')], [])
+        row = LikePost.objects.get()
+        self.assertEqual((row.liked_post_id, row.liker_id), (self.post.pk, bob.pk))
+
+    def test_likes_are_buffered_until_flush(self, _thread):
+        self.assertTrue(likes.like(self.post, 'bob'))
+        self.assertTrue(likes.like(self.post, 'carol'))
+        self.assertEqual(self.stored(), 0)
+        self.assertEqual(likes.like_count(self.post), 2)
+
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.stored(), 2)
+        self.assertEqual(self.counter.pending(self.post.id), 0)
+
+    def test_like_and_unlike_are_idempotent(self, _thread):
+        self.assertTrue(likes.like(self.post, 'bob'))
+        self.assertFalse(likes.like(self.post, 'bob'))
+        self.assertTrue(likes.unlike(self.post, 'bob'))
+        self.assertFalse(likes.unlike(self.post, 'bob'))
+        self.counter.flush()
+        self.assertEqual(self.stored(), 0)
+        self.assertFalse(LikePost.objects.exists())
+
+    def test_failed_write_keeps_the_delta(self, _thread):
+        likes.like(self.post, 'bob')
+        write = self.counter._write
+        with mock.patch.object(self.counter, '_write', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('core.likes', 'ERROR'):
+                self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.counter.pending(self.post.id), 1)
+
+        likes.like(self.post, 'carol')   # still buffered after the failure
+        self.counter._write = write
+        self.counter.flush()
+        self.assertEqual(self.stored(), 2)
+        self.assertEqual(self.counter.pending(self.post.id), 0)
+
+    def test_flusher_survives_a_failed_flush(self, _thread):
+        calls = []
+
+        def flush():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            raise SystemExit   # stop the loop on the second round
+
+        self.counter.flush_interval = 0
+        with mock.patch.object(self.counter, 'flush', side_effect=flush), \
+                self.assertLogs('core.likes', 'ERROR'), self.assertRaises(SystemExit):
+            self.counter._run()
+        self.assertEqual(len(calls), 2)
+
+    def test_write_through_returns_the_stored_count(self, _thread):
+        Post.objects.filter(pk=self.post.pk).update(no_of_likes=1)   # someone else's like
+        self.counter.flush_interval = 0
+        likes.like(self.post, 'bob')
+        self.assertEqual(self.stored(), 2)
+        self.assertEqual(likes.like_count(self.post), 2)
+        likes.unlike(self.post, 'bob')
+        self.assertEqual(likes.like_count(self.post), 1)
+
+    def test_cached_card_shows_buffered_likes(self, _thread):
+        cache.clear()
+        card = Template('{% load post_cards %}{% postcard "feed" post %}{{ post|like_count }}{% endpostcard %}')
+        self.assertEqual(card.render(Context({'post': self.post})), '0')
+        likes.like(self.post, 'bob')
+        self.assertEqual(card.render(Context({'post': self.post})), '1')
+        likes.like(self.post, 'carol')
+        self.assertEqual(card.render(Context({'post': self.post})), '2')
+
+
+class LegacyRefsTests(TestCase):
+
+    def test_unresolved_refs_are_not_looked_up_again_on_every_save(self):
+        Comment.objects.create(post=Post.objects.create(user='alice', caption='c', image='x.jpg'),
+                               user='ghost', body='hi')
+        comment = Comment.objects.get()
+        self.assertIsNone(comment.author_id)
+        with self.assertNumQueries(1):   # just the UPDATE
+            comment.save()
+
+    def test_changed_ref_is_resolved(self):
+        alice = User.objects.create_user('alice')
+        FollowersCount.objects.create(follower='ghost', user='nobody')
+        row = FollowersCount.objects.get()
+        row.user = 'alice'
+        row.save()
+        row.refresh_from_db()
+        self.assertEqual((row.follower_user_id, row.followed_user_id), (None, alice.pk))
+
+
+class FollowGraphTests(TestCase):
+
+    def setUp(self):
+        self.graph = FollowGraph()
+        patcher = mock.patch.object(follows, 'follow_graph', self.graph)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_edges_are_applied_on_commit(self):
+        self.graph.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            follows.follow_user('bob', 'alice')
+            self.assertFalse(self.graph.is_following('bob', 'alice'))
+        self.assertTrue(self.graph.is_following('bob', 'alice'))
+        self.assertEqual(self.graph.followers('alice'), ['bob'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follows.unfollow_user('bob', 'alice')
+        self.assertFalse(self.graph.is_following('bob', 'alice'))
+        self.assertEqual(self.graph.followers_count('alice'), 0)
+
+    def test_rolled_back_follow_leaves_no_edge(self):
+        self.graph.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    follows.follow_user('bob', 'alice')
+                    raise RuntimeError
+        self.assertFalse(self.graph.is_following('bob', 'alice'))
+
+    def test_writes_never_load_the_graph(self):
+        with mock.patch.object(self.graph, 'rebuild') as rebuild, self.captureOnCommitCallbacks(execute=True):
+            follows.follow_user('bob', 'alice')
+        rebuild.assert_not_called()
+        # the first read loads the committed row
+        self.assertTrue(self.graph.is_following('bob', 'alice'))
+
+    def test_writes_during_a_reload_are_replayed(self):
+        self.graph.rebuild()
+        load = FollowersCount.objects.values_list
+
+        def racing_load(*args, **kwargs):
+            # a follow commits after the reload has read the table
+            rows = list(load(*args, **kwargs).iterator())
+            self.graph._write(FollowGraph._link, 'bob', 'alice')
+            return mock.Mock(iterator=lambda: iter(rows))
+
+        with mock.patch.object(FollowersCount.objects, 'values_list', side_effect=racing_load):
+            self.graph.rebuild()
+        self.assertTrue(self.graph.is_following('bob', 'alice'))
+
+
+@mock.patch('core.likes.threading.Thread')
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.viewer = User.objects.create_user('viewer')
+        self.alice = User.objects.create_user('alice')
+        for user in (self.viewer, self.alice):
+            Profile.objects.create(user=user, id_user=user.id)
+        self.post = Post.objects.create(user='alice', caption='hello', image='x.jpg')
+        self.comment = Comment.objects.create(post=self.post, user='alice', body='first')
+        counter = likes.LikeCounter(flush_interval=60)
+        patcher = mock.patch.object(likes, 'like_counter', counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, viewset, actions, path, etag=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = self.factory.get(path, **headers)
+        force_authenticate(request, user=self.viewer)
+        return viewset.as_view(actions)(request, **kwargs)
+
+    def revalidate(self, viewset, actions, path, **kwargs):
+        """(status of a repeat GET with the ETag, that ETag)"""
+        first = self.get(viewset, actions, path, **kwargs)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        return self.get(viewset, actions, path, etag=etag, **kwargs).status_code, etag
+
+    def test_unchanged_list_is_not_modified(self, _thread):
+        status, _ = self.revalidate(PostViewSet, {'get': 'list'}, '/api/posts/')
+        self.assertEqual(status, 304)
+        response = self.get(PostViewSet, {'get': 'list'}, '/api/posts/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_not_modified_skips_serialization(self, _thread):
+        _, etag = self.revalidate(PostViewSet, {'get': 'list'}, '/api/posts/')
+        with mock.patch('core.serializers.PostSerializer.to_representation') as serialize:
+            response = self.get(PostViewSet, {'get': 'list'}, '/api/posts/', etag=etag)
+        self.assertEqual(response.status_code, 304)
+        serialize.assert_not_called()
+
+    def test_buffered_like_changes_list_and_detail(self, _thread):
+        _, list_etag = self.revalidate(PostViewSet, {'get': 'list'}, '/api/posts/')
+        _, detail_etag = self.revalidate(PostViewSet, {'get': 'retrieve'}, '/', pk=self.post.pk)
+        likes.like(self.post, 'alice')   # still buffered, not flushed
+        self.assertEqual(self.get(PostViewSet, {'get': 'list'}, '/api/posts/', etag=list_etag).status_code, 200)
+        self.assertEqual(self.get(PostViewSet, {'get': 'retrieve'}, '/', etag=detail_etag,
+                                  pk=self.post.pk).status_code, 200)
+
+    def test_edited_comment_changes_etag(self, _thread):
+        path = f'/api/comments/?post={self.post.pk}'
+        _, etag = self.revalidate(CommentViewSet, {'get': 'list'}, path)
+        self.comment.body = 'edited'
+        self.comment.save()
+        self.assertEqual(self.get(CommentViewSet, {'get': 'list'}, path, etag=etag).status_code, 200)
+
+    def test_user_field_change_changes_profile_etag(self, _thread):
+        _, etag = self.revalidate(ProfileViewSet, {'get': 'list'}, '/api/profiles/')
+        self.alice.email = 'alice@example.com'
+        self.alice.save()
+        self.assertEqual(self.get(ProfileViewSet, {'get': 'list'}, '/api/profiles/', etag=etag).status_code, 200)
+
+    def test_etag_is_per_viewer(self, _thread):
+        _, etag = self.revalidate(PostViewSet, {'get': 'list'}, '/api/posts/')
+        request = self.factory.get('/api/posts/', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.alice)
+        self.assertEqual(PostViewSet.as_view({'get': 'list'})(request).status_code, 200)
+
+
+def event(actor, notif_type='like', post_id='p1', to_user='alice'):
+    return dict(to_user=to_user, actor=actor, verb=f'{notif_type}d', notif_type=notif_type, post_id=post_id, url='')
+
+
+class NotificationTests(TestCase):
+
+    def assertCounterMatchesTable(self, username='alice'):
+        self.assertEqual(notifications.unread_count(username), notifications._count_unread(username))
+
+    def test_burst_collapses_into_one_row(self):
+        notifications.write_batch([event('bob'), event('carol')])
+        notifications.write_batch([event('dave'), event('bob')])
+        n = Notification.objects.get()
+        self.assertEqual(n.actor, 'bob')
+        self.assertEqual(n.actor_count, 3)
+        self.assertEqual(n.recent_actors, ['bob', 'dave', 'carol'])
+        self.assertEqual(notifications.unread_count('alice'), 1)
+        self.assertCounterMatchesTable()
+
+    def test_other_posts_and_types_stay_separate(self):
+        notifications.write_batch([event('bob'), event('bob', post_id='p2'), event('bob', 'comment')])
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(notifications.unread_count('alice'), 3)
+
+    def test_read_row_is_not_reopened(self):
+        notifications.create(**event('bob'))
+        first = Notification.objects.get()   # bulk-created rows come back without a pk on SQLite
+        self.assertTrue(notifications.mark_read(first))
+        self.assertFalse(notifications.mark_read(first))
+        notifications.create(**event('carol'))
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(notifications.unread_count('alice'), 1)
+        self.assertCounterMatchesTable()
+
+    def test_mark_all_read_moves_the_watermark(self):
+        notifications.write_batch([event('bob'), event('bob', post_id='p2')])
+        notifications.mark_all_read('alice')
+        self.assertEqual(notifications.unread_count('alice'), 0)
+        watermark = notifications.read_through('alice')
+        self.assertTrue(all(notifications.is_read(n, watermark) for n in Notification.objects.all()))
+        self.assertFalse(Notification.objects.filter(read=True).exists())   # no per-row writes
+
+        # a new actor after mark-all-read starts a fresh unread row
+        notifications.create(**event('carol'))
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(notifications.unread_count('alice'), 1)
+        self.assertCounterMatchesTable()
+
+    def test_rows_under_the_watermark_are_not_counted(self):
+        # mark-all-read committed with a watermark past the rows being written
+        NotificationCounter.objects.create(owner='alice', unread=0,
+                                           read_through=timezone.now() + timedelta(minutes=1))
+        notifications.write_batch([event('bob'), event('carol', post_id='p2')])
+        self.assertEqual(notifications.unread_count('alice'), 0)
+        self.assertCounterMatchesTable()
+
+    def test_counter_is_written_with_the_rows(self):
+        NotificationCounter.objects.create(owner='alice', unread=0)
+        with self.assertRaises(RuntimeError), \
+                mock.patch.object(notifications, 'is_read', side_effect=RuntimeError):
+            notifications.write_batch([event('bob')])
+        # rolled back together: no row and no count
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(notifications.unread_count('alice'), 0)
+
+    def test_counter_seeded_for_users_without_one(self):
+        Notification.objects.create(to_user='alice', actor='bob', verb='liked', notif_type='like')
+        notifications.create(**event('carol', post_id='p2'))
+        self.assertEqual(notifications.unread_count('alice'), 2)
+
+
+@mock.patch('core.notification_queue.threading.Thread')
+class NotificationQueueTests(TestCase):
+
+    def test_queued_events_are_written_in_one_batch(self, _thread):
+        q = NotificationQueue(mode='async', flush_interval=0)
+        for actor in ('bob', 'carol', 'dave'):
+            q.enqueue(event(actor))
+        self.assertFalse(Notification.objects.exists())
+        q.flush()
+        self.assertEqual(Notification.objects.get().actor_count, 3)
+        stats = q.stats()
+        self.assertEqual((stats['enqueued'], stats['written'], stats['batches'], stats['depth']), (3, 3, 1, 0))
+
+    def test_full_queue_writes_in_the_caller(self, _thread):
+        q = NotificationQueue(mode='async', maxsize=1, flush_interval=0)
+        q.enqueue(event('bob'))
+        q.enqueue(event('carol', post_id='p2'))
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(q.stats()['overflow'], 1)
+        q.flush()
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_failed_batch_is_counted_not_raised(self, _thread):
+        q = NotificationQueue(mode='async', flush_interval=0)
+        q.enqueue(event('bob'))
+        with mock.patch.object(notifications, 'write_batch', side_effect=OperationalError('database is locked')):
+            q.flush()
+        self.assertEqual(q.stats()['errors'], 1)
+        q.enqueue(event('carol'))
+        q.flush()
+        self.assertEqual(Notification.objects.count(), 1)
+
+
+class SuggestionTests(TestCase):
+
+    def setUp(self):
+        for name in ('me', 'f1', 'f2', 'fof', 'fan', 'new'):
+            user = User.objects.create_user(name)
+            Profile.objects.create(user=user, id_user=user.id)
+        for follower, user in [('me', 'f1'), ('me', 'f2'), ('f1', 'fof'), ('f2', 'fof'), ('f1', 'f2'),
+                               ('fan', 'me')]:
+            FollowersCount.objects.create(follower=follower, user=user)
+        self.graph = FollowGraph()
+        self.graph.rebuild()
+        patcher = mock.patch.object(suggestions, 'follow_graph', self.graph)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ranks_friends_of_friends_and_followers(self):
+        ranked = suggestions.rank_candidates('me')
+        self.assertEqual([(c, n) for c, _, n in ranked], [('fof', 2), ('fan', 0)])
+
+    def test_walk_is_capped_before_names_are_built(self):
+        for i in range(10):
+            FollowersCount.objects.create(follower='f1', user=f'x{i}')
+        self.graph.rebuild()
+        with mock.patch.object(suggestions, 'MAX_EXPANSION', 3), mock.patch.object(suggestions, 'MAX_FOLLOWEES', 1):
+            ranked = suggestions.rank_candidates('me', limit=100)
+        # one followee walked, at most three of its follows counted
+        self.assertLessEqual(sum(n for _, _, n in ranked), 3)
+
+    def test_serves_stored_rows(self):
+        self.assertEqual(suggestions.refresh_for('me'), 2)
+        names = [p.user.username for p in suggestions.get_suggestions('me')]
+        self.assertEqual(names, ['fof', 'fan'])
+        self.assertEqual([p.user.username for p in suggestions.get_suggestions('me', exclude={'fof'})], ['fan'])
+
+    def test_users_without_rows_get_newest_profiles_without_ranking(self):
+        with mock.patch.object(suggestions, 'rank_candidates') as rank:
+            names = [p.user.username for p in suggestions.get_suggestions('me', limit=3)]
+        rank.assert_not_called()
+        # newest first, minus the user and who they follow
+        self.assertEqual(names, ['new', 'fan', 'fof'])
+
+
+def png_bytes(color='red'):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (4, 4), color).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def temp_media(test):
+    """Point MEDIA_ROOT at a scratch directory for the test; returns the directory."""
+    tmp = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, tmp, True)
+    media = override_settings(MEDIA_ROOT=tmp + '/media')
+    media.enable()
+    test.addCleanup(media.disable)
+    return tmp
+
+
+class ChunkedUploadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('up')
+        Profile.objects.create(user=self.user, id_user=self.user.id)
+        tmp = temp_media(self)
+        patcher = mock.patch.object(uploads, 'UPLOAD_DIR', tmp + '/parts')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data = png_bytes()
+
+    def upload(self, sha256=None):
+        session = uploads.start('up', 'a.png', len(self.data), sha256 or hashlib.sha256(self.data).hexdigest())
+        half = len(self.data) // 2
+        uploads.append(session, 0, io.BytesIO(self.data[:half]), half)
+        uploads.append(session, half, io.BytesIO(self.data[half:]), len(self.data) - half)
+        return session
+
+    def test_resume_needs_the_current_offset(self):
+        session = uploads.start('up', 'a.png', len(self.data), hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(uploads.append(session, 0, io.BytesIO(self.data[:10]), 10), 10)
+        with self.assertRaises(uploads.OffsetMismatch) as ctx:
+            uploads.append(UploadSession.objects.get(pk=session.pk), 0, io.BytesIO(self.data[:10]), 10)
+        self.assertEqual(ctx.exception.offset, 10)
+
+    def test_finalize_creates_one_post(self):
+        session = self.upload()
+        post = uploads.finish(session)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.post_id), ('complete', post.pk))
+        self.assertEqual(Post.objects.count(), 1)
+        with self.assertRaises(uploads.UploadError):
+            uploads.finish(UploadSession.objects.get(pk=session.pk))
+
+    def test_concurrent_finalize_conflicts(self):
+        session = self.upload()
+        stale = UploadSession.objects.get(pk=session.pk)   # loaded while still open
+        UploadSession.objects.filter(pk=session.pk).update(status='finalizing')
+        with self.assertRaises(uploads.FinalizeConflict):
+            uploads.finish(stale)
+        self.assertFalse(Post.objects.exists())
+
+    def test_chunks_are_refused_once_claimed(self):
+        session = uploads.start('up', 'a.png', len(self.data), hashlib.sha256(self.data).hexdigest())
+        UploadSession.objects.filter(pk=session.pk).update(status='finalizing')
+        with self.assertRaises(uploads.UploadError):
+            uploads.append(session, 0, io.BytesIO(self.data[:10]), 10)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).received, 0)
+
+    def test_checksum_mismatch_reopens_at_zero(self):
+        session = self.upload(sha256='0' * 64)
+        with self.assertRaises(uploads.UploadError) as ctx:
+            uploads.finish(session)
+        self.assertEqual(ctx.exception.offset, 0)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.received), ('open', 0))
+        self.assertFalse(Post.objects.exists())
+
+
+class MediaStorageTests(TestCase):
+
+    def setUp(self):
+        temp_media(self)
+        self.user = User.objects.create_user('alice')
+        self.profile = Profile.objects.create(user=self.user, id_user=self.user.id)
+        self.factory = APIRequestFactory()
+
+    def post_with_image(self, data):
+        post = Post(user='alice', author=self.user, caption='hi')
+        post.image.save('a.png', ContentFile(data), save=False)
+        post.save()
+        images.process(post)
+        return post
+
+    def test_identical_bytes_are_stored_once_and_refcounted(self):
+        data = png_bytes()
+        first = default_storage.save('post_images/a.png', ContentFile(data))
+        second = default_storage.save('post_images/b.png', ContentFile(data))
+        self.assertEqual(first, second)
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+        default_storage.delete(first)
+        self.assertTrue(default_storage.exists(first))
+        default_storage.delete(first)
+        self.assertFalse(default_storage.exists(first))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_api_destroy_releases_image_and_variants(self):
+        post = self.post_with_image(png_bytes())
+        names = [post.image.name, post.image_thumb.name, post.image_webp.name]
+        self.assertTrue(all(names))
+        request = self.factory.delete('/')
+        force_authenticate(request, user=self.user)
+        response = PostViewSet.as_view({'delete': 'destroy'})(request, pk=str(post.pk))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_destroy_keeps_files_other_posts_share(self):
+        data = png_bytes()
+        post = self.post_with_image(data)
+        other = self.post_with_image(data)
+        request = self.factory.delete('/')
+        force_authenticate(request, user=self.user)
+        PostViewSet.as_view({'delete': 'destroy'})(request, pk=str(post.pk))
+        self.assertTrue(default_storage.exists(other.image.name))
+        self.assertEqual(MediaBlob.objects.get(name=other.image.name).refcount, 1)
+
+    def test_replacing_profile_image_releases_the_old_one(self):
+        def upload(color):
+            request = self.factory.patch('/', {'profileimg': SimpleUploadedFile('p.png', png_bytes(color))},
+                                         format='multipart')
+            force_authenticate(request, user=self.user)
+            response = ProfileViewSet.as_view({'patch': 'update_me'})(request)
+            self.assertEqual(response.status_code, 200)
+            self.profile.refresh_from_db()
+
+        upload('red')
+        old = [self.profile.profileimg.name, self.profile.profileimg_thumb.name, self.profile.profileimg_webp.name]
+        upload('blue')
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        self.assertEqual(MediaBlob.objects.count(), 3)   # the new original and its two derivatives
+
+    def test_unreadable_replacement_drops_stale_variants(self):
+        post = self.post_with_image(png_bytes())
+        old = post.image.name
+        post.image.save('b.png', ContentFile(b'not an image'), save=False)
+        post.save()
+        self.assertFalse(images.replace(post, old))
+        post.refresh_from_db()
+        self.assertFalse(post.image_thumb or post.image_webp)
+        self.assertEqual(list(MediaBlob.objects.values_list('name', flat=True)), [post.image.name])
+
+
+class MediaViewTests(TestCase):
+
+    def setUp(self):
+        self.root = temp_media(self) + '/media'
+        self.data = bytes(range(256)) * 4
+        self.name = 'post_images/plain.bin'
+        os.makedirs(self.root + '/post_images')
+        with open(f'{self.root}/{self.name}', 'wb') as f:   # a legacy file: no hash in its name
+            f.write(self.data)
+        self.factory = RequestFactory()
+
+    def get(self, path=None, **headers):
+        return media.serve_media(self.factory.get('/', **headers), path or self.name)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_response_has_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertEqual(response['Cache-Control'], f'public, max-age={media.CACHE_MAX_AGE}')
+
+    def test_etag_and_date_revalidate_to_304(self):
+        first = self.get()
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        # If-None-Match wins over a matching date
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"',
+                                  HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 200)
+
+    def test_single_ranges(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.data)}')
+        self.assertEqual(self.body(response), self.data[10:20])
+        self.assertEqual(self.body(self.get(HTTP_RANGE='bytes=-5')), self.data[-5:])
+        self.assertEqual(self.body(self.get(HTTP_RANGE='bytes=1000-')), self.data[1000:])
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        response = self.get(HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-1,5-6').status_code, 200)   # multiple ranges
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"').status_code, 200)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=http_date(0)).status_code, 200)
+
+    def test_content_addressed_files_are_immutable(self):
+        name = default_storage.save('post_images/a.png', ContentFile(png_bytes()))
+        response = self.get(name)
+        self.assertEqual(response['ETag'], '"%s"' % hashlib.sha256(png_bytes()).hexdigest())
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_missing_and_escaping_paths_404(self):
+        for path in ('post_images/nope.bin', '../secret', 'post_images'):
+            with self.assertRaises(Http404):
+                self.get(path)
+
+    def test_sendfile_hands_off_after_conditional_checks(self):
+        with mock.patch.object(media, 'SENDFILE', 'x-accel-redirect'):
+            response = self.get()
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        for name, bio, location in [('alice', 'travel and food', 'Paris'),
+                                    ('bob', 'alice fan', 'Rome'),
+                                    ('travis', 'cooking', 'Lima')]:
+            user = User.objects.create_user(name)
+            Profile.objects.create(user=user, id_user=user.id, bio=bio, location=location)
+
+    def names(self, ids):
+        return [p.user.username for p in search.ranked(Profile.objects.select_related('user'), ids)]
+
+    def test_every_term_is_a_required_prefix(self):
+        self.assertEqual(self.names(search.profile_ids('ali trav')), ['alice'])
+        self.assertEqual(self.names(search.profile_ids('par')), ['alice'])
+        self.assertEqual(search.profile_ids('alice nowhere'), [])
+
+    def test_username_hits_rank_above_bio_hits(self):
+        self.assertEqual(self.names(search.profile_ids('alice')), ['alice', 'bob'])
+        self.assertEqual(self.names(search.profile_ids('alice', exclude_users=['alice'])), ['bob'])
+
+    def test_query_syntax_in_input_is_neutralised(self):
+        self.assertEqual(search.match_expression('al* OR "bo'), '"al"* "OR"* "bo"*')
+        self.assertEqual(search.profile_ids('"*'), [])
+
+    def test_index_follows_edits_renames_and_deletes(self):
+        profile = Profile.objects.get(user__username='travis')
+        profile.bio = 'surfing'
+        profile.save()
+        self.assertEqual(search.profile_ids('cooking'), [])
+        self.assertEqual(search.profile_ids('surf'), [profile.pk])
+
+        user = profile.user
+        user.username = 'trevor'
+        user.save()
+        self.assertEqual(search.profile_ids('trev'), [profile.pk])
+        self.assertEqual(search.profile_ids('travis'), [])
+
+        profile.delete()
+        self.assertEqual(search.profile_ids('surf'), [])
+
+    def test_post_captions(self):
+        post = Post.objects.create(user='alice', caption='Sunset over the harbour', image='x.jpg')
+        Post.objects.create(user='bob', caption='harbour lights', image='y.jpg')
+        self.assertEqual(search.post_ids('sunset harb'), [post.pk])
+        self.assertEqual(len(search.post_ids('harbour')), 2)
+        self.assertEqual(search.post_ids('harbour', exclude_users=['bob']), [post.pk])
+        post.delete()
+        self.assertEqual(len(search.post_ids('harbour')), 1)
+
+    def test_rebuild_repopulates(self):
+        Post.objects.create(user='alice', caption='mountains', image='x.jpg')
+        search._execute("DELETE FROM core_profile_fts", [])
+        search._execute("DELETE FROM core_post_fts", [])
+        self.assertEqual(search.profile_ids('alice'), [])
+        search.rebuild()
+        self.assertEqual(self.names(search.profile_ids('alice')), ['alice', 'bob'])
+        self.assertEqual(len(search.post_ids('mountain')), 1)
+
+    def test_ranked_keeps_the_given_order(self):
+        ids = list(Profile.objects.order_by('-id').values_list('id', flat=True))
+        self.assertEqual([p.pk for p in search.ranked(Profile.objects.all(), ids)], ids)
+        self.assertFalse(search.ranked(Profile.objects.all(), []).exists())
+
+
+class TypeaheadTests(TestCase):
+
+    def setUp(self):
+        for name in ('alice', 'Al', 'alan', 'alex', 'albert', 'bob'):
+            user = User.objects.create_user(name)
+            Profile.objects.create(user=user, id_user=user.id)
+        FollowersCount.objects.create(follower='alice', user='alex')
+        FollowersCount.objects.create(follower='albert', user='alice')
+        graph = FollowGraph()
+        graph.rebuild()
+        patcher = mock.patch.object(typeahead, 'follow_graph', graph)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = typeahead.UsernameIndex()
+
+    def names(self, prefix, **kwargs):
+        return [n for n, _, _ in self.index.suggest(prefix, 'alice', **kwargs)]
+
+    def test_followed_then_followers_then_shortest(self):
+        self.assertEqual(self.names('AL'), ['alex', 'albert', 'Al', 'alan'])
+        self.assertEqual(self.index.suggest('alex', 'alice'), [('alex', Profile.objects.get(user__username='alex').avatar_url, True)])
+        self.assertEqual(self.names('al', exclude={'alex'}, limit=2), ['albert', 'Al'])
+        self.assertEqual(self.names('  '), [])
+
+    def test_connections_are_not_lost_behind_the_scan_cap(self):
+        with mock.patch.object(typeahead, 'MAX_SCAN', 1):
+            self.assertEqual(self.names('al'), ['alex', 'albert', 'Al'])
+
+    def test_writes_apply_once_loaded(self):
+        self.index.add('alfred', '/a.png')   # not loaded yet: picked up by the first load instead
+        self.assertNotIn('alfred', self.names('alf'))
+        self.index.add('alfred', '/a.png')
+        self.assertEqual(self.index.suggest('alf', 'alice'), [('alfred', '/a.png', False)])
+        self.index.remove('alan')
+        self.assertNotIn('alan', self.names('al'))
+        self.assertEqual(self.index.stats(), {'usernames': 6})
+
+    def test_profile_signals_keep_the_index_current(self):
+        self.index.rebuild()
+        with mock.patch('core.signals.username_index', self.index):
+            user = User.objects.create_user('alina')
+            Profile.objects.create(user=user, id_user=user.id)
+            self.assertEqual(self.names('alin'), ['alina'])
+            Profile.objects.get(user=user).delete()
+            self.assertEqual(self.names('alin'), [])
+
+
+class CounterTests(TestCase):
+
+    def setUp(self):
+        for name in ('alice', 'bob'):
+            user = User.objects.create_user(name)
+            Profile.objects.create(user=user, id_user=user.id)
+
+    def counts(self, name):
+        p = Profile.objects.get(user__username=name)
+        return p.followers_count, p.following_count, p.posts_count
+
+    def test_write_paths_keep_counts(self):
+        follows.follow_user('bob', 'alice')
+        post = Post.objects.create(user='alice', caption='c', image='x.jpg')
+        comment = Comment.objects.create(post=post, user='bob', body='hi')
+        self.assertEqual(self.counts('alice'), (1, 0, 1))
+        self.assertEqual(self.counts('bob'), (0, 1, 0))
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+        comment.delete()
+        post.delete()
+        follows.unfollow_user('bob', 'alice')
+        self.assertEqual(self.counts('alice'), (0, 0, 0))
+        self.assertEqual(self.counts('bob'), (0, 0, 0))
+
+    def test_counts_never_go_negative(self):
+        counters.unfollowed('bob', 'alice')
+        self.assertEqual(self.counts('alice'), (0, 0, 0))
+
+    def test_full_save_of_a_stale_instance_keeps_counts(self):
+        profile = Profile.objects.get(user__username='alice')
+        follows.follow_user('bob', 'alice')
+        profile.bio = 'edited'
+        profile.save()
+        self.assertEqual(self.counts('alice'), (1, 0, 0))
+
+    def test_reconcile_counters_repairs_drift(self):
+        follows.follow_user('bob', 'alice')
+        post = Post.objects.create(user='alice', caption='c', image='x.jpg')
+        Comment.objects.create(post=post, user='bob', body='hi')
+        Profile.objects.update(followers_count=7, following_count=7, posts_count=7)
+        Post.objects.update(comments_count=0)
+        out = io.StringIO()
+        call_command('reconcile_counters', chunk_size=1, stdout=out)
+        self.assertIn('Corrected counts on 2 profile(s)', out.getvalue())
+        self.assertEqual(self.counts('alice'), (1, 0, 1))
+        self.assertEqual(self.counts('bob'), (0, 1, 0))
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Corrected comment counts on 0 post(s)', out.getvalue())
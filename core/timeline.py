@@ -0,0 +1,139 @@
+# core/timeline.py
+"""
+Materialized home timelines (fan-out on write).
+
+When a user posts, a TimelineEntry is written for each of their followers, so
+building a home feed is one indexed query on (owner, created_at) instead of one
+Post query per followed user.
+
+Authors with a very large audience are not fanned out (that would be one insert
+per follower on every post). Their posts are pulled at read time and merged
+with the materialized rows -- see `home_feed`.
+"""
+from django.conf import settings
+
+from .models import Post, Profile, FollowersCount, TimelineEntry
+from .pagination import keyset_q
+
+# authors with at least this many followers are read with the pull path
+FANOUT_THRESHOLD = getattr(settings, 'TIMELINE_FANOUT_THRESHOLD', 5000)
+# how many of a user's recent posts get copied into a new follower's timeline
+BACKFILL_LIMIT = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 200)
+BATCH_SIZE = 500
+
+
+# read from the stored Profile.followers_count rather than the per-process
+# follow graph, which can be behind other workers' follows
+
+def is_high_fanout(username):
+    return Profile.objects.filter(user__username=username, followers_count__gte=FANOUT_THRESHOLD).exists()
+
+
+def high_fanout_followees(username):
+    """Usernames followed by `username` whose posts are served by the pull path."""
+    following = FollowersCount.objects.filter(follower=username).values('user')
+    return set(Profile.objects
+               .filter(user__username__in=following, followers_count__gte=FANOUT_THRESHOLD)
+               .values_list('user__username', flat=True))
+
+
+def fan_out_post(post):
+    """
+    Push a new post into every follower's timeline.
+    Returns the number of rows written (0 for high-fanout authors).
+    """
+    if is_high_fanout(post.user):
+        return 0
+    followers = FollowersCount.objects.filter(user=post.user).values_list('follower', flat=True)
+    entries = [
+        TimelineEntry(owner=f, post=post, author=post.user, created_at=post.created_at)
+        for f in set(followers)
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def backfill_follow(follower, user):
+    """Copy the most recent posts of `user` into `follower`'s timeline after a follow."""
+    if is_high_fanout(user):
+        # pulled at read time, nothing to copy
+        return 0
+    recent = (Post.objects.filter(user=user)
+              .order_by('-created_at')
+              .values_list('id', 'created_at')[:BACKFILL_LIMIT])
+    entries = [
+        TimelineEntry(owner=follower, post_id=post_id, author=user, created_at=created_at)
+        for post_id, created_at in recent
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def remove_follow(follower, user):
+    """Drop `user`'s posts from `follower`'s timeline (unfollow / block)."""
+    TimelineEntry.objects.filter(owner=follower, author=user).delete()
+
+
+def rebuild_for(username):
+    """Recreate one user's timeline from the follow table (cold start / repair)."""
+    TimelineEntry.objects.filter(owner=username).delete()
+    for followee in FollowersCount.objects.filter(follower=username).values_list('user', flat=True).distinct():
+        backfill_follow(username, followee)
+
+
+def home_feed(username, exclude_authors=(), limit=None, before=None, after=None):
+    """
+    Posts for `username`'s home feed, newest first.
+    Merges the materialized timeline with posts pulled from high-fanout followees.
+
+    `before` / `after` are (created_at, post_id) keys (see core.pagination).
+    With `before` the page continues below the key; with `after` it holds the
+    `limit` posts immediately above the key, so a client catching up on new
+    posts never skips any.
+    """
+    exclude_authors = set(exclude_authors)
+    newer = after is not None
+    order = ('created_at', 'post_id') if newer else ('-created_at', '-post_id')
+
+    entries = (TimelineEntry.objects
+               .filter(owner=username)
+               .exclude(author__in=exclude_authors)
+               .select_related('post'))
+    if before is not None:
+        entries = entries.filter(keyset_q(before, 'lt', id_field='post_id'))
+    if newer:
+        entries = entries.filter(keyset_q(after, 'gt', id_field='post_id'))
+    entries = entries.order_by(*order)
+    if limit is not None:
+        entries = entries[:limit]
+    posts = [e.post for e in entries]
+
+    pulled_authors = high_fanout_followees(username) - exclude_authors
+    if pulled_authors:
+        pulled = Post.objects.filter(user__in=pulled_authors)
+        if before is not None:
+            pulled = pulled.filter(keyset_q(before, 'lt'))
+        if newer:
+            pulled = pulled.filter(keyset_q(after, 'gt'))
+        pulled = pulled.order_by(*[o.replace('post_id', 'id') for o in order])
+        if limit is not None:
+            pulled = pulled[:limit]
+        seen = {p.id for p in posts}
+        posts.extend(p for p in pulled if p.id not in seen)
+        posts.sort(key=lambda p: (p.created_at, p.id), reverse=not newer)
+
+    if limit is not None:
+        posts = posts[:limit]
+    if newer:
+        posts.reverse()
+    return posts
+
+
+def home_feed_page(username, exclude_authors=(), limit=20, before=None, after=None):
+    """One page of `home_feed` plus whether more posts exist in the paging direction."""
+    posts = home_feed(username, exclude_authors, limit=limit + 1, before=before, after=after)
+    has_more = len(posts) > limit
+    if has_more:
+        # the extra row is the one furthest from the cursor
+        posts = posts[1:] if after is not None else posts[:limit]
+    return posts, has_more
@@ -0,0 +1,124 @@
+# core/typeahead.py
+"""
+In-process username index for as-you-type suggestions.
+
+Usernames are kept lowercased in one sorted list, so the matches for a prefix
+are a contiguous run found with a bisect - no query per keystroke. Each entry
+also carries the username's avatar URL, so a suggestion needs nothing from the
+database.
+
+Ranking: people the viewer follows come first, then people who follow the
+viewer, then everyone else; within a group shorter (closer) names win. Followed
+users and followers are found by filtering the viewer's lists from core.graph,
+so they are never lost behind MAX_SCAN other matches. Blocked users are dropped
+using the cached sets in core.blocks.
+
+Like the follow graph, the index is per process. It loads itself from Profile on
+first use, is updated when profiles are saved or deleted (core/signals.py) and
+reloads when older than TYPEAHEAD_MAX_AGE seconds, so workers that didn't see a
+signup converge.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .graph import follow_graph
+from .models import Profile
+
+MAX_AGE = getattr(settings, 'TYPEAHEAD_MAX_AGE', 300)
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# matches looked at per query for the "everyone else" group
+MAX_SCAN = 200
+
+
+class UsernameIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._keys = []      # sorted (lowercased username, username)
+        self._avatars = {}   # username -> avatar url
+
+    # -- loading -----------------------------------------------------------
+
+    def rebuild(self):
+        """Reload the whole index from Profile."""
+        rows = Profile.objects.select_related('user').only(
+            'profileimg', 'profileimg_thumb', 'user__username').iterator()
+        avatars = {p.user.username: p.avatar_url for p in rows}
+        keys = sorted((name.lower(), name) for name in avatars)
+        with self._lock:
+            self._keys, self._avatars = keys, avatars
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > MAX_AGE:
+            self.rebuild()
+
+    def invalidate(self):
+        """Force a reload on next access."""
+        self._loaded_at = None
+
+    # -- writes ------------------------------------------------------------
+
+    def add(self, username, avatar_url):
+        if self._loaded_at is None:
+            return   # the first load will pick it up
+        with self._lock:
+            if username not in self._avatars:
+                insort(self._keys, (username.lower(), username))
+            self._avatars[username] = avatar_url
+
+    def remove(self, username):
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            if self._avatars.pop(username, None) is None:
+                return
+            key = (username.lower(), username)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    # -- reads -------------------------------------------------------------
+
+    def _prefix_matches(self, prefix):
+        keys = self._keys
+        i = bisect_left(keys, (prefix,))
+        end = min(len(keys), i + MAX_SCAN)
+        while i < end and keys[i][0].startswith(prefix):
+            yield keys[i][1]
+            i += 1
+
+    def suggest(self, prefix, viewer, exclude=(), limit=DEFAULT_LIMIT):
+        """
+        [(username, avatar_url, is_following)] for usernames starting with
+        `prefix` (case-insensitive), best first. `viewer` and `exclude` are skipped.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._ensure_loaded()
+        skip = set(exclude) | {viewer}
+        avatars = self._avatars
+
+        following = {n for n in follow_graph.following(viewer) if n.lower().startswith(prefix)}
+        followers = {n for n in follow_graph.followers(viewer) if n.lower().startswith(prefix)}
+        candidates = (following | followers | set(self._prefix_matches(prefix))) - skip
+
+        def rank(name):
+            group = 0 if name in following else 1 if name in followers else 2
+            return group, len(name), name.lower()
+
+        ranked = sorted((n for n in candidates if n in avatars), key=rank)[:limit]
+        return [(n, avatars[n], n in following) for n in ranked]
+
+    def stats(self):
+        self._ensure_loaded()
+        return {'usernames': len(self._keys)}
+
+
+username_index = UsernameIndex()
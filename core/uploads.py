@@ -0,0 +1,178 @@
+# core/uploads.py
+"""
+Chunked, resumable image uploads.
+
+  1. init      create an UploadSession with the file's name, size and SHA-256
+  2. PUT       append a chunk at `offset` (must equal the bytes received so far);
+               the request body is streamed straight to a part file, never held
+               in memory. After a dropped connection the client asks for the
+               session, reads `offset`, and carries on from there.
+  3. finalize  once every byte is in: check the SHA-256, check it's an image,
+               and create the Post from the part file. The request first claims
+               the session (open -> finalizing in one conditional UPDATE), so
+               two concurrent finalize calls can't both create a post.
+
+Part files live in UPLOAD_SESSION_DIR (default <BASE_DIR>/upload_parts), outside
+MEDIA_ROOT so half-uploaded files are never served. `manage.py
+clear_upload_sessions` removes sessions that were abandoned.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+
+from .models import Post, UploadSession
+
+UPLOAD_DIR = getattr(settings, 'UPLOAD_SESSION_DIR', os.path.join(settings.BASE_DIR, 'upload_parts'))
+MAX_UPLOAD_SIZE = getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 20 * 1024 * 1024)
+MAX_CHUNK_SIZE = getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024)
+CHUNK_SIZE = 1024 * 1024          # suggested to clients
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised with a message for the client; `offset` tells it where to resume."""
+
+    def __init__(self, message, offset=None):
+        super().__init__(message)
+        self.offset = offset
+
+
+class OffsetMismatch(UploadError):
+    """The chunk doesn't start where the upload currently ends."""
+
+    def __init__(self, offset):
+        super().__init__('offset mismatch', offset=offset)
+
+
+class FinalizeConflict(UploadError):
+    """Another request is finalizing (or has finalized) this upload."""
+
+
+def part_path(session):
+    return os.path.join(UPLOAD_DIR, f'{session.id}.part')
+
+
+def start(owner, filename, size, sha256, caption=''):
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadError(f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes')
+    sha256 = (sha256 or '').lower()
+    if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+        raise UploadError('sha256 must be a hex SHA-256 digest')
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    session = UploadSession.objects.create(
+        owner=owner, filename=os.path.basename(filename)[:255] or 'upload',
+        size=size, sha256=sha256, caption=caption,
+    )
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def append(session, offset, stream, length):
+    """
+    Write `length` bytes read from `stream` at `offset`. Returns the new offset.
+    Whatever arrived before a dropped connection is kept, so the client can resume.
+    """
+    if session.status != 'open':
+        raise UploadError('upload already finalized')
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if length <= 0 or length > MAX_CHUNK_SIZE:
+        raise UploadError(f'chunk must be between 1 and {MAX_CHUNK_SIZE} bytes')
+    if offset + length > session.size:
+        raise UploadError('chunk runs past the declared size')
+
+    written = 0
+    with open(part_path(session), 'r+b') as part:
+        part.truncate(offset)      # drop bytes from a write that never got recorded
+        part.seek(offset)
+        try:
+            while written < length:
+                chunk = stream.read(min(READ_SIZE, length - written))
+                if not chunk:
+                    break
+                part.write(chunk)
+                written += len(chunk)
+        finally:
+            part.flush()
+            os.fsync(part.fileno())
+            # conditional on the old offset so two concurrent PUTs can't both land,
+            # and on the status so nothing lands once finalize has claimed the upload
+            updated = (UploadSession.objects
+                       .filter(pk=session.pk, received=offset, status='open')
+                       .update(received=F('received') + written))
+    if not updated:
+        session.refresh_from_db()
+        if session.status != 'open':
+            raise UploadError('upload already finalized')
+        raise OffsetMismatch(session.received)
+    session.received = offset + written
+    return session.received
+
+
+def finish(session):
+    """Verify the assembled file and create the Post. Returns the Post."""
+    if session.status != 'open':
+        raise UploadError('upload already finalized')
+    if session.received != session.size:
+        raise UploadError('upload incomplete', offset=session.received)
+
+    with transaction.atomic():
+        claimed = (UploadSession.objects
+                   .filter(pk=session.pk, status='open', received=session.size)
+                   .update(status='finalizing', updated_at=timezone.now()))
+    if not claimed:
+        raise FinalizeConflict('upload is already being finalized')
+    session.status = 'finalizing'
+    try:
+        post = _create_post(session)
+    except BaseException:
+        # give the upload back so the client can retry or resume
+        UploadSession.objects.filter(pk=session.pk, status='finalizing').update(status='open')
+        session.status = 'open'
+        raise
+    os.remove(part_path(session))
+    return post
+
+
+def _create_post(session):
+    path = part_path(session)
+    sha = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for chunk in iter(lambda: part.read(READ_SIZE), b''):
+            sha.update(chunk)
+    if sha.hexdigest() != session.sha256:
+        # start over: the bytes on disk can't be trusted
+        open(path, 'wb').close()
+        UploadSession.objects.filter(pk=session.pk).update(received=0)
+        session.received = 0
+        raise UploadError('checksum mismatch', offset=0)
+
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise UploadError('file is not a valid image')
+
+    with open(path, 'rb') as part:
+        post = Post(user=session.owner, caption=session.caption)
+        post.image.save(session.filename, File(part), save=False)
+        with transaction.atomic():   # the row, the author's posts_count and the session
+            post.save()
+            session.status = 'complete'
+            session.post = post
+            session.save(update_fields=['status', 'post', 'updated_at'])
+    return post
+
+
+def discard(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
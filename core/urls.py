@@ -15,7 +15,9 @@ urlpatterns = [
     path('notifications/', views.notifications, name='notifications'),
     path('notifications/mark-read/<int:notif_id>/', views.mark_notification_read, name='mark_notification_read'),
     path('notifications/mark-all-read/', views.mark_all_read, name='mark_all_read'),
+    path('notifications/unread-count/', views.unread_notification_count, name='unread_notification_count'),
     path('add-comment/', views.add_comment, name='add_comment'),
+    path('comments/<uuid:post_id>/', views.more_comments, name='more_comments'),
     path('delete-post/<uuid:post_id>/', views.delete_post, name='delete-post'),
     path('block/', views.block_user, name='block-user'),
     path('unblock/', views.unblock_user, name='unblock-user'),
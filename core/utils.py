@@ -1,23 +1,21 @@
 # core/utils.py
-from .models import Notification
-from django.db import IntegrityError
+from .notification_queue import notification_queue
 
 def create_notification(to_username, actor_username, verb, notif_type='like', post_id=None, url=''):
     """
-    Create a Notification record. Fail quietly but return the object on success.
+    Queue a Notification for writing by the background worker (see
+    core.notification_queue), which folds it into a recent one for the same
+    post when it can (core.notifications). Never raises into the caller.
     """
     try:
-        n = Notification.objects.create(
+        notification_queue.enqueue(dict(
             to_user=to_username,
             actor=actor_username,
             verb=verb,
             notif_type=notif_type,
             post_id=post_id,
             url=url,
-        )
-        return n
-    except IntegrityError:
-        return None
+        ))
     except Exception:
         # avoid crashing the main user flow for any unexpected reason
-        return None
+        pass
@@ -3,15 +3,21 @@ from django.contrib.auth.models import User, auth
 from django.contrib import messages
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from .models import Profile, Post, LikePost, FollowersCount, Block
-from itertools import chain
-import random
 from .utils import create_notification
+from . import timeline, follows, suggestions, likes, blocks, realtime, images, comments
+from . import search as fulltext      # the module; `search` below is the view
+from . import notifications as notifs   # the module; `notifications` below is the view
+from .pagination import encode_cursor, decode_cursor
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import Notification
 from django.shortcuts import render, redirect, get_object_or_404
 
+FEED_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 20
+
 
 # Create your views here.
 
@@ -22,49 +28,33 @@ def index(request):
     user_object = User.objects.get(username=me)
     user_profile = Profile.objects.get(user=user_object)
 
-    # find users I follow
-    user_following = FollowersCount.objects.filter(follower=me)
-    following_usernames = [f.user for f in user_following]
-
     # get blocks: users I blocked and users who blocked me
-    blocked_by_me_qs = Block.objects.filter(blocker=me).values_list('blocked', flat=True)
-    blocked_me_qs = Block.objects.filter(blocked=me).values_list('blocker', flat=True)
-    blocked_by_me = set(blocked_by_me_qs)
-    blocked_me = set(blocked_me_qs)
-
-    # build feed: for each followed user, include their posts only if neither blocked relationship exists
-    feed = []
-    for username in following_usernames:
-        if username in blocked_by_me or username in blocked_me:
-            # skip posts from users who are blocked in either direction
-            continue
-        qs = Post.objects.filter(user=username)
-        feed.append(qs)
-    feed_list = list(chain(*feed))
-
-    # USER SUGGESTIONS (exclude anyone blocked or who blocked me)
-    all_users = User.objects.exclude(username__in=[me])  # exclude me
-    # exclude users already followed, and any blocked or who blocked me
-    followed_usernames_set = set(following_usernames)
-    exclude_usernames = followed_usernames_set.union({me}).union(blocked_by_me).union(blocked_me)
-    suggestions = [u for u in all_users if u.username not in exclude_usernames]
-    random.shuffle(suggestions)
-
-    # map to profiles
-    username_profile_list = []
-    for u in suggestions[:10]:
-        plist = Profile.objects.filter(id_user=u.id)
-        username_profile_list.extend(plist)
-    suggestions_username_profile_list = username_profile_list
-
-    # COMMENTS: load all comments (or optionally restrict to feed posts)
-    comments = Comment.objects.filter(post__in=feed_list).order_by('timestamp')
+    blocked_by_me, blocked_me = blocks.block_sets(me)
+
+    # build one page of the feed from the materialized timeline, skipping users blocked in either direction
+    try:
+        before = decode_cursor(request.GET.get('before'))
+    except ValueError:
+        before = None
+    feed_list, has_more = timeline.home_feed_page(
+        me, exclude_authors=blocked_by_me | blocked_me, limit=FEED_PAGE_SIZE, before=before
+    )
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(feed_list[-1].created_at, feed_list[-1].id)
+
+    # USER SUGGESTIONS: precomputed friends-of-friends (exclude anyone blocked or who blocked me)
+    suggestions_username_profile_list = suggestions.get_suggestions(me, exclude=blocked_by_me | blocked_me)
+
+    # COMMENTS: latest few per feed post, one query; attached as post.latest_comments
+    feed_list = comments.attach_latest(feed_list, exclude_users=blocked_by_me | blocked_me)
 
     return render(request, 'index.html', {
         'user_profile': user_profile,
         'posts': feed_list,
-        'comments': comments,
-        'suggestions_username_profile_list': suggestions_username_profile_list[:4]
+        'next_cursor': next_cursor,
+        'suggestions_username_profile_list': suggestions_username_profile_list[:4],
+        'unread_notification_count': notifs.unread_count(me),
     })
 
 @login_required(login_url='signin')
@@ -75,8 +65,11 @@ def upload(request):
         image = request.FILES.get('image_upload')
         caption = request.POST['caption']
 
-        new_post = Post.objects.create(user=user, image=image, caption=caption)
-        new_post.save()
+        # the row and the author's posts_count (core.counters, via signals) commit together
+        with transaction.atomic():
+            new_post = Post.objects.create(user=user, author=request.user, image=image, caption=caption)
+        images.process(new_post)
+        timeline.fan_out_post(new_post)
 
         return redirect('/')
     else:
@@ -103,17 +96,18 @@ def delete_post(request, post_id):
         messages.error(request, "You are not authorized to delete this post.")
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
-    # delete image file from storage if present
+    # delete DB record (its TimelineEntry rows cascade with it) together with
+    # the author's posts_count decrement from the post_delete signal
+    with transaction.atomic():
+        post.delete()
+
+    # then release the image and its derivatives from storage
     try:
-        if post.image:
-            post.image.delete(save=False)  # removes file but not model
+        images.delete_files(post)
     except Exception as e:
-        # log to console for debugging; don't stop deletion of DB record
+        # log to console for debugging; the post is already gone
         print("Warning: failed to delete file for post", post.id, e)
 
-    # delete DB record
-    post.delete()
-
     messages.success(request, "Post deleted successfully.")
     # redirect back to referrer or to the owner's profile
     return redirect(request.META.get('HTTP_REFERER', f"/profile/{post.user}"))
@@ -122,22 +116,17 @@ def search(request):
     user_object = User.objects.get(username=request.user.username)
     user_profile = Profile.objects.get(user=user_object)
 
-    if request.method == 'POST':
-        username = request.POST['username']
-        username_object = User.objects.filter(username__icontains=username)
-
-        username_profile = []
-        username_profile_list = []
-
-        for users in username_object:
-            username_profile.append(users.id)
-
-        for ids in username_profile:
-            profile_lists = Profile.objects.filter(id_user=ids)
-            username_profile_list.append(profile_lists)
-        
-        username_profile_list = list(chain(*username_profile_list))
-    return render(request, 'search.html', {'user_profile': user_profile, 'username_profile_list': username_profile_list})
+    username = request.POST.get('username') or request.GET.get('q', '')
+    hidden = blocks.blocked_either_way(request.user.username)
+    # ranked full-text matches: one MATCH query plus one query per result set
+    username_profile_list = fulltext.search_profiles(username, exclude_users=hidden, limit=SEARCH_PAGE_SIZE)
+    post_results = fulltext.search_posts(username, exclude_users=hidden, limit=SEARCH_PAGE_SIZE)
+    return render(request, 'search.html', {
+        'user_profile': user_profile,
+        'username': username,
+        'username_profile_list': username_profile_list,
+        'post_results': post_results,
+    })
 
 @login_required(login_url='signin')
 def like_post(request):
@@ -146,17 +135,10 @@ def like_post(request):
 
     post = Post.objects.get(id=post_id)
 
-    like_filter = LikePost.objects.filter(post_id=post_id, username=username).first()
-
-    if like_filter is None:
-        new_like = LikePost.objects.create(post_id=post_id, username=username)
-        new_like.save()
-
-        post.no_of_likes += 1
-        post.save()
-
-        # 🔔 Notification
-        if post.user != username:
+    # toggle: remove an existing like, otherwise add one (unique per post+user)
+    if not likes.unlike(post, username):
+        if likes.like(post, username, user=request.user) and post.user != username:
+            # 🔔 Notification
             create_notification(
                 to_username=post.user,
                 actor_username=username,
@@ -166,11 +148,6 @@ def like_post(request):
                 url=f"/profile/{post.user}"
             )
 
-    else:
-        like_filter.delete()
-        post.no_of_likes -= 1
-        post.save()
-
     # 🔙 Redirect to the same page
     return redirect(request.META.get('HTTP_REFERER', '/'))
 
@@ -182,8 +159,9 @@ def profile(request, pk):
 
     # If the current user is blocked by the profile owner, do not show posts
     me = request.user.username
-    blocked_by_profile = Block.objects.filter(blocker=pk, blocked=me).exists()
-    i_blocked_profile = Block.objects.filter(blocker=me, blocked=pk).exists()
+    blocked_by_me, blocked_me = blocks.block_sets(me)
+    blocked_by_profile = pk in blocked_me
+    i_blocked_profile = pk in blocked_by_me
 
     if blocked_by_profile:
         # optional: still allow viewing basic profile but hide posts & actions
@@ -198,30 +176,27 @@ def profile(request, pk):
             blocked_message = "You have blocked this user; their posts are hidden."
         else:
             user_posts = Post.objects.filter(user=pk).order_by('-created_at')
-            user_post_length = user_posts.count()
+            user_post_length = user_profile.posts_count
             blocked_message = None
 
-    follower = me
-    user = pk
-    if FollowersCount.objects.filter(follower=follower, user=user).first():
+    # follow state is checked in the database (the per-process follow graph
+    # can lag other workers' writes); counts come from the profile row
+    if FollowersCount.objects.filter(follower=me, user=pk).exists():
         button_text = 'Unfollow'
     else:
         button_text = 'Follow'
 
-    user_followers = FollowersCount.objects.filter(user=pk).count()
-    user_following = FollowersCount.objects.filter(follower=pk).count()
+    user_followers = user_profile.followers_count
+    user_following = user_profile.following_count
 
     # comments for posts on this profile
-    comments_qs = Comment.objects.filter(post__in=user_posts).order_by('timestamp')
-    comments_by_post = {}
-    for c in comments_qs:
-        comments_by_post.setdefault(str(c.post.id), []).append(c)
+    user_posts = comments.attach_latest(user_posts, exclude_users=blocked_by_me | blocked_me)
 
     # can delete if owner or admin
     can_delete = request.user.is_authenticated and (request.user.username == pk or request.user.is_superuser)
 
     # check block status from me -> profile (for showing block/unblock button)
-    is_blocking = Block.objects.filter(blocker=me, blocked=pk).exists()
+    is_blocking = i_blocked_profile
 
     context = {
         'user_object': user_object,
@@ -231,7 +206,6 @@ def profile(request, pk):
         'button_text': button_text,
         'user_followers': user_followers,
         'user_following': user_following,
-        'comments_by_post': comments_by_post,
         'can_delete': can_delete,
         'blocked_message': blocked_message,
         'is_blocking': is_blocking,
@@ -245,12 +219,10 @@ def follow(request):
         user = request.POST['user']
 
         if FollowersCount.objects.filter(follower=follower, user=user).first():
-            delete_follower = FollowersCount.objects.get(follower=follower, user=user)
-            delete_follower.delete()
+            follows.unfollow_user(follower, user)
             return redirect('/profile/'+user)
         else:
-            new_follower = FollowersCount.objects.create(follower=follower, user=user)
-            new_follower.save()
+            follows.follow_user(follower, user)
             if follower != user:       # avoid self follow scenario
                 create_notification(
                     to_username=user,
@@ -283,11 +255,13 @@ def settings(request):
             image = request.FILES.get('image')
             bio = request.POST['bio']
             location = request.POST['location']
+            old_image = user_profile.profileimg.name
 
             user_profile.profileimg = image
             user_profile.bio = bio
             user_profile.location = location
             user_profile.save()
+            images.replace(user_profile, old_image)
         
         return redirect('settings')
     return render(request, 'setting.html', {'user_profile': user_profile})
@@ -357,6 +331,7 @@ def notifications(request):
     GET /notifications/  -> returns JSON list of notifications for logged-in user
     """
     qs = Notification.objects.filter(to_user=request.user.username).order_by('-timestamp')[:40]
+    watermark = notifs.read_through(request.user.username)
     data = []
     for n in qs:
         data.append({
@@ -366,27 +341,36 @@ def notifications(request):
             "notif_type": n.notif_type,
             "post_id": n.post_id,
             "url": n.url,
-            "read": n.read,
+            "read": notifs.is_read(n, watermark),
+            "actor_count": n.actor_count,
+            "recent_actors": n.recent_actors,
+            "summary": n.summary,
             "timestamp": n.timestamp.strftime("%Y-%m-%d %H:%M"),
         })
-    return JsonResponse({"notifications": data})
+    return JsonResponse({"notifications": data, "unread_count": notifs.unread_count(request.user.username)})
 
 
 @require_POST
 @login_required(login_url='signin')
 def mark_notification_read(request, notif_id):
     notif = Notification.objects.get(id=notif_id, to_user=request.user.username)
-    notif.read = True
-    notif.save()
+    if notifs.mark_read(notif):
+        realtime.publish_unread_count(request.user.username)
     return JsonResponse({"status": "ok", "id": notif.id})
 
 
 @require_POST
 @login_required(login_url='signin')
 def mark_all_read(request):
-    Notification.objects.filter(to_user=request.user.username, read=False).update(read=True)
+    notifs.mark_all_read(request.user.username)
+    realtime.publish_unread_count(request.user.username, 0)
     return JsonResponse({"status": "ok"})
 
+
+@login_required(login_url='signin')
+def unread_notification_count(request):
+    return JsonResponse({"unread_count": notifs.unread_count(request.user.username)})
+
 # core/views.py (append)
 from django.views.decorators.http import require_POST
 from .models import Comment
@@ -406,8 +390,13 @@ def add_comment(request):
     except Post.DoesNotExist:
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
+    if blocks.is_blocked_between(user, post.user):
+        messages.error(request, "You can't comment on this post.")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+
     # create comment
-    comment = Comment.objects.create(post=post, user=user, body=body)
+    with transaction.atomic():   # with the post's comments_count
+        comment = Comment.objects.create(post=post, user=user, author=request.user, body=body)
 
     # create notification for the post owner (avoid notifying yourself)
     try:
@@ -439,6 +428,33 @@ def delete_comment(request, comment_id):
     return redirect(request.META.get('HTTP_REFERER', '/'))
 
 
+@login_required(login_url='signin')
+def more_comments(request, post_id):
+    """
+    GET /comments/<post_id>/?before=<cursor>  -> older comments for a post, oldest first.
+    The first cursor comes from the page (the oldest comment shown); each
+    response carries the next one.
+    """
+    me = request.user.username
+    post = get_object_or_404(Post, id=post_id)
+    if blocks.is_blocked_between(me, post.user):
+        return JsonResponse({"error": "not found"}, status=404)
+    try:
+        before = decode_cursor(request.GET.get('before'))
+    except ValueError:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+
+    rows, has_more = comments.older_comments(post.id, before, exclude_users=blocks.blocked_either_way(me))
+    data = [{
+        "id": str(c.id),
+        "user": c.user,
+        "body": c.body,
+        "timestamp": c.timestamp.strftime("%b %d, %Y %H:%M"),
+    } for c in rows]
+    next_cursor = encode_cursor(rows[0].timestamp, rows[0].id) if has_more else None
+    return JsonResponse({"comments": data, "next_cursor": next_cursor, "has_more": has_more})
+
+
 @require_POST
 @login_required(login_url='signin')
 def block_user(request):
@@ -448,10 +464,9 @@ def block_user(request):
         messages.error(request, "Invalid block request.")
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
-    Block.objects.get_or_create(blocker=blocker, blocked=blocked)
+    blocks.block(blocker, blocked)
     # optionally remove follow relationships
-    FollowersCount.objects.filter(follower=blocker, user=blocked).delete()
-    FollowersCount.objects.filter(follower=blocked, user=blocker).delete()
+    follows.sever_follows(blocker, blocked)
     messages.success(request, f"You blocked {blocked}.")
     return redirect(request.META.get('HTTP_REFERER', '/'))
 
@@ -464,7 +479,7 @@ def unblock_user(request):
     if not blocked:
         messages.error(request, "Invalid unblock request.")
         return redirect(request.META.get('HTTP_REFERER', '/'))
-    Block.objects.filter(blocker=blocker, blocked=blocked).delete()
+    blocks.unblock(blocker, blocked)
     messages.success(request, f"You unblocked {blocked}.")
     return redirect(request.META.get('HTTP_REFERER', '/'))
 
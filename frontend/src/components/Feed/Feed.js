@@ -1,24 +1,28 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { postAPI } from '../../services/api';
 import PostCard from '../Post/PostCard';
 import CreatePost from '../Post/CreatePost';
 import UserSuggestions from './UserSuggestions';
 import './Feed.css';
 
+const FEED_REFRESH_INTERVAL = 60000;
+
 const Feed = () => {
   const [posts, setPosts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
-
-  useEffect(() => {
-    loadFeed();
-  }, []);
+  // newest_cursor of what we already have; refreshes only ask for posts above it
+  const newestCursor = useRef(null);
 
   const loadFeed = async () => {
     try {
       setLoading(true);
       const response = await postAPI.getFeed();
-      setPosts(response.data);
+      setPosts(response.data.results);
+      setNextCursor(response.data.next_cursor);
+      newestCursor.current = response.data.newest_cursor;
       setError('');
     } catch (error) {
       setError('Failed to load feed');
@@ -28,8 +32,56 @@ const Feed = () => {
     }
   };
 
-  const handlePostCreated = () => {
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await postAPI.getFeed({ cursor: nextCursor });
+      setPosts((current) => [...current, ...response.data.results]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Feed error:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Fetch only posts newer than what we already show and prepend them.
+  const refreshFeed = useCallback(async () => {
+    if (!newestCursor.current) {
+      return;
+    }
+    try {
+      let hasMore = true;
+      while (hasMore) {
+        const response = await postAPI.getFeed({ since: newestCursor.current });
+        const fresh = response.data.results;
+        if (fresh.length > 0) {
+          setPosts((current) => {
+            const ids = new Set(current.map((p) => p.id));
+            return [...fresh.filter((p) => !ids.has(p.id)), ...current];
+          });
+        }
+        newestCursor.current = response.data.newest_cursor;
+        hasMore = response.data.has_more;
+      }
+    } catch (error) {
+      console.error('Feed refresh error:', error);
+    }
+  }, []);
+
+  useEffect(() => {
     loadFeed();
+    const timer = setInterval(refreshFeed, FEED_REFRESH_INTERVAL);
+    return () => clearInterval(timer);
+  }, [refreshFeed]);
+
+  const handlePostCreated = () => {
+    if (newestCursor.current) {
+      refreshFeed();
+    } else {
+      loadFeed();
+    }
   };
 
   const handlePostDelete = (postId) => {
@@ -37,7 +89,7 @@ const Feed = () => {
   };
 
   const handlePostUpdate = () => {
-    loadFeed();
+    refreshFeed();
   };
 
   if (loading) {
@@ -63,6 +115,11 @@ const Feed = () => {
             />
           ))
         )}
+        {nextCursor && (
+          <button className="load-more-btn" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        )}
       </div>
       <div className="feed-sidebar">
         <UserSuggestions />
@@ -72,4 +129,3 @@ const Feed = () => {
 };
 
 export default Feed;
-
@@ -48,7 +48,7 @@ const UserSuggestions = () => {
             >
               {profile.profileimg_url && (
                 <img
-                  src={profile.profileimg_url}
+                  src={profile.profileimg_thumb_url || profile.profileimg_url}
                   alt={profile.username}
                   className="suggestion-avatar"
                 />
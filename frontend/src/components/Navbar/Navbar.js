@@ -13,16 +13,28 @@ const Navbar = () => {
   useEffect(() => {
     if (user) {
       loadUnreadCount();
-      const interval = setInterval(loadUnreadCount, 30000);
-      return () => clearInterval(interval);
+      // the stream sends the current count on connect and on every change
+      let interval = null;
+      const stream = notificationAPI.stream();
+      const onCount = (e) => setUnreadCount(JSON.parse(e.data).unread_count);
+      stream.addEventListener('unread', onCount);
+      stream.addEventListener('notification', onCount);
+      stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED && !interval) {
+          interval = setInterval(loadUnreadCount, 30000);
+        }
+      };
+      return () => {
+        stream.close();
+        if (interval) clearInterval(interval);
+      };
     }
   }, [user]);
 
   const loadUnreadCount = async () => {
     try {
-      const response = await notificationAPI.list();
-      const unread = response.data.filter(n => !n.read).length;
-      setUnreadCount(unread);
+      const response = await notificationAPI.unreadCount();
+      setUnreadCount(response.data.unread_count);
     } catch (error) {
       console.error('Load notifications error:', error);
     }
@@ -58,7 +70,7 @@ const Navbar = () => {
           <Link to={`/profile/${user.username}`} className="nav-link">
             {profile?.profileimg_url ? (
               <img
-                src={profile.profileimg_url}
+                src={profile.profileimg_thumb_url || profile.profileimg_url}
                 alt={user.username}
                 className="nav-avatar"
               />
@@ -11,15 +11,34 @@ const Notifications = () => {
 
   useEffect(() => {
     loadNotifications();
-    const interval = setInterval(loadNotifications, 30000); // Refresh every 30 seconds
-    return () => clearInterval(interval);
+
+    // new notifications are pushed over the event stream; poll only if it fails
+    let interval = null;
+    const stream = notificationAPI.stream();
+    stream.addEventListener('notification', (e) => {
+      const data = JSON.parse(e.data);
+      setNotifications(prev => [data.notification, ...prev.filter(n => n.id !== data.notification.id)]);
+      setUnreadCount(data.unread_count);
+    });
+    stream.addEventListener('unread', (e) => {
+      setUnreadCount(JSON.parse(e.data).unread_count);
+    });
+    stream.onerror = () => {
+      if (stream.readyState === EventSource.CLOSED && !interval) {
+        interval = setInterval(loadNotifications, 30000);
+      }
+    };
+    return () => {
+      stream.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   const loadNotifications = async () => {
     try {
-      const response = await notificationAPI.list();
-      setNotifications(response.data);
-      setUnreadCount(response.data.filter(n => !n.read).length);
+      const [response, count] = await Promise.all([notificationAPI.list(), notificationAPI.unreadCount()]);
+      setNotifications(response.data.results || response.data);
+      setUnreadCount(count.data.unread_count);
     } catch (error) {
       console.error('Notifications error:', error);
     } finally {
@@ -84,7 +103,12 @@ const Notifications = () => {
               onClick={() => handleNotificationClick(notification)}
             >
               <div className="notification-content">
-                <strong>{notification.actor}</strong> {notification.verb}
+                <strong>{notification.actor}</strong>
+                {notification.actor_count > 1 && (
+                  notification.actor_count === 2 && notification.recent_actors.length > 1
+                    ? <> and <strong>{notification.recent_actors[1]}</strong></>
+                    : ` and ${notification.actor_count - 1} other${notification.actor_count > 2 ? 's' : ''}`
+                )} {notification.verb}
                 <span className="notification-time">
                   {new Date(notification.timestamp).toLocaleString()}
                 </span>
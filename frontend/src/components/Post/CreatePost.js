@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { postAPI } from '../../services/api';
+import { uploadAPI } from '../../services/api';
 import './CreatePost.css';
 
 const CreatePost = ({ onPostCreated }) => {
@@ -8,6 +8,7 @@ const CreatePost = ({ onPostCreated }) => {
   const [preview, setPreview] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [progress, setProgress] = useState(0);
 
   const handleImageChange = (e) => {
     const file = e.target.files[0];
@@ -30,9 +31,11 @@ const CreatePost = ({ onPostCreated }) => {
 
     setLoading(true);
     setError('');
+    setProgress(0);
 
     try {
-      await postAPI.create({ image, caption });
+      // chunked so a dropped connection resumes instead of starting over
+      await uploadAPI.createPost(image, caption, setProgress);
       setCaption('');
       setImage(null);
       setPreview(null);
@@ -71,7 +74,7 @@ const CreatePost = ({ onPostCreated }) => {
           />
         </div>
         <button type="submit" disabled={loading} className="btn-primary">
-          {loading ? 'Posting...' : 'Post'}
+          {loading ? `Posting... ${Math.round(progress * 100)}%` : 'Post'}
         </button>
       </form>
     </div>
@@ -9,6 +9,7 @@ const PostCard = ({ post, onDelete, onUpdate }) => {
   const [isLiked, setIsLiked] = useState(post.is_liked);
   const [likes, setLikes] = useState(post.no_of_likes);
   const [comments, setComments] = useState([]);
+  const [commentsCursor, setCommentsCursor] = useState(null);
   const [showComments, setShowComments] = useState(false);
   const [commentText, setCommentText] = useState('');
   const [loading, setLoading] = useState(false);
@@ -31,10 +32,12 @@ const PostCard = ({ post, onDelete, onUpdate }) => {
     }
   };
 
-  const loadComments = async () => {
+  const loadComments = async (cursor = null) => {
     try {
-      const response = await commentAPI.list({ post: post.id });
-      setComments(response.data);
+      const response = await postAPI.getComments(post.id, { order: 'oldest', cursor });
+      const { results, next_cursor: nextCursor } = response.data;
+      setComments(cursor ? [...comments, ...results] : results);
+      setCommentsCursor(nextCursor);
     } catch (error) {
       console.error('Load comments error:', error);
     }
@@ -100,7 +103,7 @@ const PostCard = ({ post, onDelete, onUpdate }) => {
         >
           {post.user_profile?.profileimg_url && (
             <img
-              src={post.user_profile.profileimg_url}
+              src={post.user_profile.profileimg_thumb_url || post.user_profile.profileimg_url}
               alt={post.user}
               className="post-avatar"
             />
@@ -119,7 +122,17 @@ const PostCard = ({ post, onDelete, onUpdate }) => {
       </div>
 
       {post.image_url && (
-        <img src={post.image_url} alt="Post" className="post-image" />
+        <picture>
+          {post.webp_url && <source srcSet={post.webp_url} type="image/webp" />}
+          <img
+            src={post.image_url}
+            alt="Post"
+            className="post-image"
+            width={post.image_width || undefined}
+            height={post.image_height || undefined}
+            loading="lazy"
+          />
+        </picture>
       )}
 
       <div className="post-content">
@@ -158,6 +171,11 @@ const PostCard = ({ post, onDelete, onUpdate }) => {
                   )}
                 </div>
               ))}
+              {commentsCursor && (
+                <button onClick={() => loadComments(commentsCursor)} className="load-more-comments-btn">
+                  Load more comments
+                </button>
+              )}
             </div>
             <form onSubmit={handleAddComment} className="comment-form">
               <input
@@ -1,14 +1,41 @@
-import React, { useState } from 'react';
-import { profileAPI } from '../../services/api';
+import React, { useEffect, useState } from 'react';
+import { searchAPI } from '../../services/api';
 import { useNavigate } from 'react-router-dom';
 import './Search.css';
 
+const TYPEAHEAD_DELAY = 120;
+
 const Search = () => {
   const [query, setQuery] = useState('');
   const [results, setResults] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
   const [loading, setLoading] = useState(false);
   const navigate = useNavigate();
 
+  // as-you-type username suggestions; older requests are cancelled
+  useEffect(() => {
+    const prefix = query.trim();
+    if (!prefix) {
+      setSuggestions([]);
+      return undefined;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await searchAPI.typeahead(prefix, { signal: controller.signal });
+        setSuggestions(response.data.results);
+      } catch (error) {
+        if (!controller.signal.aborted) {
+          setSuggestions([]);
+        }
+      }
+    }, TYPEAHEAD_DELAY);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [query]);
+
   const handleSearch = async (e) => {
     e.preventDefault();
     if (!query.trim()) {
@@ -17,9 +44,10 @@ const Search = () => {
     }
 
     setLoading(true);
+    setSuggestions([]);
     try {
-      const response = await profileAPI.list({ username: query });
-      setResults(response.data);
+      const response = await searchAPI.search({ q: query, type: 'profiles' });
+      setResults(response.data.profiles);
     } catch (error) {
       console.error('Search error:', error);
       setResults([]);
@@ -33,13 +61,31 @@ const Search = () => {
       <div className="search-card">
         <h2>Search Users</h2>
         <form onSubmit={handleSearch} className="search-form">
-          <input
-            type="text"
-            value={query}
-            onChange={(e) => setQuery(e.target.value)}
-            placeholder="Search by username..."
-            className="search-input"
-          />
+          <div className="search-input-wrap">
+            <input
+              type="text"
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+              placeholder="Search by username..."
+              className="search-input"
+              autoComplete="off"
+            />
+            {suggestions.length > 0 && (
+              <ul className="typeahead-list">
+                {suggestions.map((s) => (
+                  <li
+                    key={s.username}
+                    className="typeahead-item"
+                    onMouseDown={() => navigate(`/profile/${s.username}`)}
+                  >
+                    <img src={s.avatar_url} alt={s.username} className="typeahead-avatar" />
+                    <span>{s.username}</span>
+                    {s.is_following && <small className="typeahead-following">Following</small>}
+                  </li>
+                ))}
+              </ul>
+            )}
+          </div>
           <button type="submit" className="search-btn" disabled={loading}>
             {loading ? 'Searching...' : 'Search'}
           </button>
@@ -56,7 +102,7 @@ const Search = () => {
               >
                 {profile.profileimg_url && (
                   <img
-                    src={profile.profileimg_url}
+                    src={profile.profileimg_thumb_url || profile.profileimg_url}
                     alt={profile.username}
                     className="result-avatar"
                   />
@@ -79,4 +125,3 @@ const Search = () => {
 };
 
 export default Search;
-
@@ -11,9 +11,32 @@ const api = axios.create({
   },
 });
 
+// Conditional GETs: read endpoints return ETag / Last-Modified; we keep the
+// last body per URL and send the validators back, so an unchanged list comes
+// back as an empty 304 and is answered from here.
+const VALIDATED_CACHE_SIZE = 200;
+const validated = new Map(); // url -> { etag, lastModified, data }
+
+const cacheKey = (config) => api.getUri(config);
+
+const remember = (key, entry) => {
+  validated.delete(key);
+  validated.set(key, entry);
+  if (validated.size > VALIDATED_CACHE_SIZE) {
+    validated.delete(validated.keys().next().value);
+  }
+};
+
 // Request interceptor
 api.interceptors.request.use(
   (config) => {
+    if ((config.method || 'get').toLowerCase() === 'get') {
+      const cached = validated.get(cacheKey(config));
+      if (cached) {
+        if (cached.etag) config.headers['If-None-Match'] = cached.etag;
+        if (cached.lastModified) config.headers['If-Modified-Since'] = cached.lastModified;
+      }
+    }
     return config;
   },
   (error) => {
@@ -21,9 +44,28 @@ api.interceptors.request.use(
   }
 );
 
+api.defaults.validateStatus = (status) => (status >= 200 && status < 300) || status === 304;
+
 // Response interceptor
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const { config, headers } = response;
+    if ((config.method || 'get').toLowerCase() !== 'get') return response;
+    const key = cacheKey(config);
+    if (response.status === 304) {
+      const cached = validated.get(key);
+      if (cached) {
+        return { ...response, status: 200, data: cached.data };
+      }
+      // nothing to reuse (evicted): fetch the full body
+      validated.delete(key);
+      return api.get(config.url, { params: config.params });
+    }
+    if (headers.etag || headers['last-modified']) {
+      remember(key, { etag: headers.etag, lastModified: headers['last-modified'], data: response.data });
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       // Handle unauthorized - redirect to login
@@ -37,7 +79,10 @@ api.interceptors.response.use(
 export const authAPI = {
   signup: (data) => api.post('/auth/signup/', data),
   login: (data) => api.post('/auth/login/', data),
-  logout: () => api.post('/auth/logout/'),
+  logout: () => {
+    validated.clear();
+    return api.post('/auth/logout/');
+  },
   getUserInfo: () => api.get('/auth/user/'),
 };
 
@@ -85,10 +130,53 @@ export const postAPI = {
   delete: (id) => api.delete(`/posts/${id}/`),
   like: (id) => api.post(`/posts/${id}/like/`),
   unlike: (id) => api.delete(`/posts/${id}/like/`),
-  getFeed: () => api.get('/posts/feed/'),
+  // params: { order: 'newest'|'oldest', limit, cursor } (cursor from next_cursor)
+  getComments: (id, params) => api.get(`/posts/${id}/comments/`, { params }),
+  // params: { limit, cursor } for older pages, { since } for posts newer than newest_cursor
+  getFeed: (params) => api.get('/posts/feed/', { params }),
   getSuggestions: () => api.get('/posts/suggestions/'),
 };
 
+// Chunked, resumable uploads: init, PUT chunks at the server's offset, finalize
+const sha256Hex = async (file) => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+export const uploadAPI = {
+  start: (data) => api.post('/uploads/', data),
+  status: (id) => api.get(`/uploads/${id}/`),
+  putChunk: (id, offset, blob) => api.put(`/uploads/${id}/`, blob, {
+    headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': offset },
+  }),
+  finalize: (id) => api.post(`/uploads/${id}/finalize/`),
+  abort: (id) => api.delete(`/uploads/${id}/`),
+
+  // Upload `file` as a new post; retries a failed chunk from wherever the server got to.
+  createPost: async (file, caption, onProgress, maxRetries = 5) => {
+    const { data: session } = await uploadAPI.start({
+      filename: file.name, size: file.size, sha256: await sha256Hex(file), caption,
+    });
+    let offset = session.offset;
+    let retries = 0;
+    while (offset < file.size) {
+      try {
+        const { data } = await uploadAPI.putChunk(
+          session.id, offset, file.slice(offset, offset + session.chunk_size));
+        offset = data.offset;
+        retries = 0;
+        if (onProgress) onProgress(offset / file.size);
+      } catch (error) {
+        if (++retries > maxRetries) throw error;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+        // resume from what the server actually has
+        offset = (await uploadAPI.status(session.id)).data.offset;
+      }
+    }
+    return uploadAPI.finalize(session.id);
+  },
+};
+
 // Comment APIs
 export const commentAPI = {
   list: (params) => api.get('/comments/', { params }),
@@ -111,6 +199,15 @@ export const notificationAPI = {
   get: (id) => api.get(`/notifications/${id}/`),
   markRead: (id) => api.post(`/notifications/${id}/mark_read/`),
   markAllRead: () => api.post('/notifications/mark_all_read/'),
+  unreadCount: () => api.get('/notifications/unread_count/'),
+  // server-sent events: 'unread' and 'notification' events (needs the ASGI server)
+  stream: () => new EventSource(`${API_BASE_URL}/notifications/stream/`, { withCredentials: true }),
+};
+
+// Search APIs
+export const searchAPI = {
+  search: (params) => api.get('/search/', { params }),
+  typeahead: (q, config) => api.get('/search/typeahead/', { params: { q }, ...config }),
 };
 
 // Block APIs
@@ -2,6 +2,8 @@
 ASGI config for social_book project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to the notification event stream are answered by a long-lived async
+handler (core.realtime); everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +15,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_book.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after Django is set up, since it loads models
+from core.realtime import STREAM_PATH, notification_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        await notification_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
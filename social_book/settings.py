@@ -133,6 +133,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# uploads are stored by content hash and deduplicated (core/storage.py)
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
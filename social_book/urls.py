@@ -13,16 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.api_urls')),  # API endpoints
+    # uploaded media with ETag / Range / cache headers (core/media.py)
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
     path('', include('core.urls')),  # Keep old views for backward compatibility (optional)
-]
-
-urlpatterns = urlpatterns+static(settings.MEDIA_URL,
-document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file